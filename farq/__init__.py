@@ -1,24 +1,26 @@
 """
 Farq - A Python library for raster change detection and analysis.
 """
-import numpy as _np
 import matplotlib.pyplot as plt
-import rasterio
 from rasterio.enums import Resampling
 import os
-from typing import Tuple, Dict, Union, Optional
 
 # Import core functionality
 from .core import (
     read,
+    read_many,
     write,
     resample,
-    validate_bands
+    validate_bands,
+    stream_index
 )
 
 # Import utility functions
 from .utils import (
     stats,
+    nanmin,
+    nanmax,
+    nansum,
     min,
     max,
     mean,
@@ -40,13 +42,19 @@ from .indices import (
     ndbi,
     nbr,
     ndmi,
+    ndsi,
     calculate_indices,
-    calculate_normalized_difference
+    calculate_normalized_difference,
+    calculate_normalized_difference_q8,
+    ndwi_q8,
+    ndvi_q8,
+    set_precision
 )
 
 # Import visualization functions
 from .visualization import (
     plot,
+    FastPlotter,
     compare,
     changes,
     hist,
@@ -58,11 +66,16 @@ from .visualization import (
 # Import analysis functions
 from .analysis import (
     water_stats,
+    water_area_from_bands,
     water_change,
     get_water_bodies,
-    calculate_shape_metrics
+    calculate_shape_metrics,
+    BitMask
 )
 
+# Import kernel compilation
+from ._kernels import precompile
+
 # Make commonly used functions and modules available at package level
 __version__ = "0.1.3"
 
@@ -70,17 +83,19 @@ __version__ = "0.1.3"
 __all__ = [
     # Core functions
     'read',
+    'read_many',
     'write',
     'resample',
     'validate_bands',
+    'stream_index',
     
     # Utility functions
     'stats',
-    'min',
-    'max',
+    'nanmin',
+    'nanmax',
     'mean',
     'std',
-    'sum',
+    'nansum',
     'median',
     'percentile',
     'count_nonzero',
@@ -95,11 +110,17 @@ __all__ = [
     'ndbi',
     'nbr',
     'ndmi',
+    'ndsi',
     'calculate_indices',
     'calculate_normalized_difference',
+    'calculate_normalized_difference_q8',
+    'ndwi_q8',
+    'ndvi_q8',
+    'set_precision',
     
     # Visualization functions
     'plot',
+    'FastPlotter',
     'compare',
     'changes',
     'hist',
@@ -109,9 +130,14 @@ __all__ = [
     
     # Analysis functions
     'water_stats',
+    'water_area_from_bands',
     'water_change',
     'get_water_bodies',
     'calculate_shape_metrics',
+    'BitMask',
+    
+    # Kernel compilation
+    'precompile',
     
     # Common libraries
     'plt',
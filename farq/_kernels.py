@@ -0,0 +1,1017 @@
+"""
+Fused per-pixel kernels for the Farq library.
+
+This module provides single-pass implementations of the elementwise
+operations behind the spectral indices. When numba is installed the kernels
+are JIT-compiled and run in parallel over the flattened arrays; otherwise
+equivalent NumPy implementations are used.
+
+All kernels write into a caller-allocated output array and return it. The
+NumPy implementations are applied tile by tile so that the cast, formula and
+clip for each tile run while it is resident in L2 cache, and only the final
+output is written back to main memory. Large arrays are split between
+threads, since NumPy releases the GIL inside ufuncs.
+"""
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Optional, Tuple
+
+from scipy import ndimage
+
+try:
+    from numba import njit, prange, get_num_threads, set_num_threads
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+# fastmath flags that keep NaN/Inf semantics intact ('nnan'/'ninf' would
+# let LLVM drop the non-finite checks the kernels rely on)
+_FASTMATH = {'nsz', 'arcp', 'contract', 'afn', 'reassoc'}
+
+# Bytes of input and output data per tile for the NumPy implementations
+_TILE_BYTES = 256 * 1024
+
+# Minimum number of elements per thread for the parallel kernels, so that
+# waking the thread pool does not dominate the run time of small inputs
+_MIN_ELEMENTS_PER_THREAD = 64 * 1024
+
+@contextmanager
+def _threads_for(size: int):
+    """Limit numba to the number of threads `size` elements keep busy."""
+    n_threads = get_num_threads()
+    set_num_threads(max(1, min(n_threads, size // _MIN_ELEMENTS_PER_THREAD)))
+    try:
+        yield
+    finally:
+        set_num_threads(n_threads)
+
+def _use_numba(*arrays: np.ndarray) -> bool:
+    """Whether the numba kernels can take the arrays (numba has no float16)."""
+    return HAS_NUMBA and all(a.dtype != np.float16 for a in arrays)
+
+def _tiled_apply(fn, *arrays: np.ndarray, out: np.ndarray, tile: Optional[int] = None,
+                 max_workers: Optional[int] = None) -> np.ndarray:
+    """
+    Apply fn(*input_tiles, output_tile) over flat tiles of the arrays.
+    
+    Each thread processes its own contiguous run of tiles, so tiles are
+    still visited in memory order within a thread. Floating point errors
+    are ignored for the whole run rather than per tile: the kernels map
+    non-finite results to 0 themselves.
+    
+    Args:
+        fn: Function writing its result into the output tile
+        *arrays: Input arrays with the same number of elements as `out`
+        out: Contiguous output array
+        tile: Number of elements per tile (default: sized to ~256 KiB of
+            input and output data)
+        max_workers: Maximum number of threads (default: number of CPUs)
+        
+    Returns:
+        The output array
+    """
+    flat = [a.reshape(-1) for a in arrays]
+    flat_out = out.reshape(-1)
+    if tile is None:
+        itemsize = sum(a.itemsize for a in arrays) + out.itemsize
+        tile = max(1024, _TILE_BYTES // itemsize)
+    
+    def run(start, stop):
+        # Error state is thread-local, so it is set in each worker
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for i in range(start, stop, tile):
+                j = min(i + tile, stop)
+                fn(*(a[i:j] for a in flat), flat_out[i:j])
+    
+    n_tiles = -(-flat_out.size // tile)
+    n_workers = min(max_workers or os.cpu_count() or 1, n_tiles,
+                    flat_out.size // _MIN_ELEMENTS_PER_THREAD)
+    if n_workers <= 1:
+        run(0, flat_out.size)
+        return out
+    
+    # Split the tiles into one contiguous run per thread
+    bounds = [min(k * tile, flat_out.size)
+              for k in np.linspace(0, n_tiles, n_workers + 1).round().astype(int)]
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        list(executor.map(run, bounds[:-1], bounds[1:]))
+    return out
+
+def _masked_divide(num: np.ndarray, den: np.ndarray, out: np.ndarray, finite_inputs: bool) -> None:
+    """
+    Write num / den into out, setting zero denominators to 0.
+    
+    With finite (integer) inputs a zero denominator is the only source of
+    non-finite results, so only those pixels are masked. Float inputs may
+    hold NaN or Inf themselves and are passed through `nan_to_num` as well.
+    """
+    if finite_inputs:
+        zero = den == 0
+        np.divide(num, den, out=out, where=~zero)
+        out[zero] = 0
+        return
+    np.divide(num, den, out=out)
+    np.nan_to_num(out, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+
+def _nd_numpy(a: np.ndarray, b: np.ndarray, out: np.ndarray, clip: bool) -> None:
+    """NumPy implementation of the normalized difference kernel."""
+    finite_inputs = a.dtype.kind in 'biu' and b.dtype.kind in 'biu'
+    # Build the numerator in `out`; mixed-dtype ufuncs are slow, so bands are cast
+    # first, `a` into `out` itself
+    b = b.astype(out.dtype, copy=False)
+    if a.dtype != out.dtype:
+        # `out` may be `b` itself, which must not be overwritten before it is read
+        if np.may_share_memory(b, out):
+            b = b.copy()
+        np.copyto(out, a)
+        a = out
+    den = a + b
+    np.subtract(a, b, out=out)
+    _masked_divide(out, den, out, finite_inputs)
+    if clip:
+        np.clip(out, -1.0, 1.0, out=out)
+
+if HAS_NUMBA:
+    @njit(parallel=True, fastmath=_FASTMATH, error_model='numpy', cache=True)
+    def _nd_numba(a, b, out, clip):
+        for i in prange(out.size):
+            x = out.dtype.type(a[i])
+            y = out.dtype.type(b[i])
+            v = (x - y) / (x + y)
+            if not np.isfinite(v):
+                v = 0.0
+            elif clip:
+                if v < -1.0:
+                    v = -1.0
+                elif v > 1.0:
+                    v = 1.0
+            out[i] = v
+
+def normalized_difference(a: np.ndarray,
+                          b: np.ndarray,
+                          out: np.ndarray,
+                          clip: bool = True) -> np.ndarray:
+    """
+    Compute (a - b) / (a + b) into a preallocated output array.
+    
+    Non-finite results (zero denominators, NaN or infinite inputs) are set
+    to 0. Inputs of any numeric dtype are converted to the dtype of `out`
+    per pixel, so no full-size cast copies are made.
+    
+    Args:
+        a: First band array
+        b: Second band array, same shape as `a`
+        out: Contiguous floating point output array, same shape as `a`
+        clip: Whether to clip values to [-1, 1] range
+    
+    Returns:
+        The output array
+    """
+    if _use_numba(a, b):
+        with _threads_for(out.size):
+            _nd_numba(a.ravel(), b.ravel(), out.reshape(-1), clip)
+        return out
+    return _tiled_apply(lambda a, b, o: _nd_numpy(a, b, o, clip), a, b, out=out)
+
+if HAS_NUMBA:
+    @njit(parallel=True, fastmath=_FASTMATH, error_model='numpy', cache=True)
+    def _nd_q8_numba(a, b, out, proto):
+        for i in prange(out.size):
+            x = proto.dtype.type(a[i])
+            y = proto.dtype.type(b[i])
+            v = (x - y) / (x + y)
+            if not np.isfinite(v):
+                v = 0.0
+            elif v < -1.0:
+                v = -1.0
+            elif v > 1.0:
+                v = 1.0
+            q = np.rint(v * 127)
+            # Keep the sign of small non-zero values
+            if q == 0.0:
+                if v > 0.0:
+                    q = 1.0
+                elif v < 0.0:
+                    q = -1.0
+            out[i] = np.int8(q)
+
+def normalized_difference_q8(a: np.ndarray,
+                             b: np.ndarray,
+                             out: np.ndarray,
+                             dtype: np.dtype) -> np.ndarray:
+    """
+    Compute the clipped normalized difference quantized to int8.
+    
+    Values in [-1, 1] are stored as round(value * 127), except that non-zero
+    values too small to round to +/-1 are stored as +/-1, so the sign of
+    every pixel is the same as in the floating point result.
+    
+    Args:
+        a: First band array
+        b: Second band array, same shape as `a`
+        out: Contiguous int8 output array, same shape as `a`
+        dtype: Floating point dtype the difference is calculated in
+        
+    Returns:
+        The output array
+    """
+    dtype = np.dtype(dtype)
+    if _use_numba(a, b):
+        with _threads_for(out.size):
+            _nd_q8_numba(a.ravel(), b.ravel(), out.reshape(-1), np.empty(1, dtype))
+        return out
+    
+    def _tile(a, b, o):
+        nd = np.empty(o.shape, dtype=dtype)
+        _nd_numpy(a, b, nd, True)
+        q = np.rint(nd * 127)
+        np.copyto(q, np.sign(nd), where=(q == 0))
+        o[...] = q
+    return _tiled_apply(_tile, a, b, out=out)
+
+if HAS_NUMBA:
+    @njit(parallel=True, fastmath=_FASTMATH, error_model='numpy', cache=True)
+    def _nd_count_numba(a, b, threshold, proto):
+        count = 0
+        if threshold == 0.0:
+            # (a - b) / (a + b) > 0 exactly when a finite difference and sum
+            # have the same sign, so no division is needed
+            for i in prange(a.size):
+                x = proto.dtype.type(a[i])
+                y = proto.dtype.type(b[i])
+                d = x - y
+                s = x + y
+                if np.isfinite(d) and np.isfinite(s) and ((d > 0 and s > 0) or (d < 0 and s < 0)):
+                    count += 1
+        else:
+            for i in prange(a.size):
+                x = proto.dtype.type(a[i])
+                y = proto.dtype.type(b[i])
+                v = (x - y) / (x + y)
+                if not np.isfinite(v):
+                    v = 0.0
+                elif v < -1.0:
+                    v = -1.0
+                elif v > 1.0:
+                    v = 1.0
+                if v > threshold:
+                    count += 1
+        return count
+
+def normalized_difference_count(a: np.ndarray,
+                                b: np.ndarray,
+                                threshold: float,
+                                dtype: np.dtype) -> int:
+    """
+    Count pixels where the clipped normalized difference exceeds a threshold.
+    
+    Gives the same count as normalized_difference(a, b, out) > threshold
+    without allocating the index array.
+    
+    Args:
+        a: First band array
+        b: Second band array, same shape as `a`
+        threshold: Threshold on the normalized difference
+        dtype: Floating point dtype the difference is calculated in
+        
+    Returns:
+        Number of pixels above the threshold
+    """
+    dtype = np.dtype(dtype)
+    if _use_numba(a, b):
+        with _threads_for(a.size):
+            return int(_nd_count_numba(a.ravel(), b.ravel(), dtype.type(threshold), np.empty(1, dtype)))
+    
+    a = a.reshape(-1)
+    b = b.reshape(-1)
+    tile = max(1024, _TILE_BYTES // (a.itemsize + b.itemsize + dtype.itemsize))
+    buffer = np.empty(min(tile, a.size), dtype=dtype)
+    count = 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for i in range(0, a.size, tile):
+            out = buffer[:min(tile, a.size - i)]
+            _nd_numpy(a[i:i + tile], b[i:i + tile], out, True)
+            count += np.count_nonzero(out > dtype.type(threshold))
+    return count
+
+def _savi_numpy(nir: np.ndarray, red: np.ndarray, out: np.ndarray, L: float, scale: float) -> None:
+    """NumPy implementation of the SAVI kernel."""
+    finite_inputs = nir.dtype.kind in 'biu' and red.dtype.kind in 'biu'
+    t = out.dtype.type
+    # As in `_nd_numpy`, with the scale folded into L so the bands are never scaled
+    red = red.astype(out.dtype, copy=False)
+    if nir.dtype != out.dtype:
+        if np.may_share_memory(red, out):
+            red = red.copy()
+        np.copyto(out, nir)
+        nir = out
+    den = nir + red
+    den += t(L * scale)
+    np.subtract(nir, red, out=out)
+    out *= t(1 + L)
+    _masked_divide(out, den, out, finite_inputs)
+    np.clip(out, -1.0, 1.0, out=out)
+
+if HAS_NUMBA:
+    @njit(parallel=True, fastmath=_FASTMATH, error_model='numpy', cache=True)
+    def _savi_numba(nir, red, out, L, gain, scale):
+        for i in prange(out.size):
+            n = out.dtype.type(nir[i]) / scale
+            r = out.dtype.type(red[i]) / scale
+            v = (n - r) / (n + r + L) * gain
+            if not np.isfinite(v):
+                v = 0.0
+            elif v < -1.0:
+                v = -1.0
+            elif v > 1.0:
+                v = 1.0
+            out[i] = v
+
+def savi(nir: np.ndarray, red: np.ndarray, out: np.ndarray, L: float, scale: float = 1.0) -> np.ndarray:
+    """
+    Compute ((NIR - RED) / (NIR + RED + L)) * (1 + L) clipped to [-1, 1].
+    
+    Bands of any numeric dtype are converted to the dtype of `out` and
+    divided by `scale` per pixel. Non-finite results are set to 0.
+    
+    Args:
+        nir: Near-infrared band array
+        red: Red band array, same shape as `nir`
+        out: Contiguous floating point output array, same shape as `nir`
+        L: Soil brightness correction factor
+        scale: Reflectance scale factor the bands are divided by
+        
+    Returns:
+        The output array
+    """
+    if _use_numba(nir, red):
+        t = out.dtype.type
+        with _threads_for(out.size):
+            _savi_numba(nir.ravel(), red.ravel(), out.reshape(-1), t(L), t(1 + L), t(scale))
+        return out
+    return _tiled_apply(lambda n, r, o: _savi_numpy(n, r, o, L, scale), nir, red, out=out)
+
+def _evi_numpy(red: np.ndarray, nir: np.ndarray, blue: np.ndarray, out: np.ndarray,
+               G: float, C1: float, C2: float, L: float, scale: float) -> None:
+    """NumPy implementation of the EVI kernel."""
+    finite_inputs = all(band.dtype.kind in 'biu' for band in (red, nir, blue))
+    t = out.dtype.type
+    # Build the denominator in one scratch array, using `out` for C2 * BLUE and
+    # then the numerator; as in SAVI the scale only remains on L. Bands that
+    # are `out` itself are copied, since they are read again for the numerator
+    red, nir = (band.copy() if np.may_share_memory(band, out) else band for band in (red, nir))
+    den = np.multiply(red, t(C1), dtype=out.dtype)
+    np.add(den, nir, out=den)
+    np.multiply(blue, t(C2), out=out, dtype=out.dtype)
+    den -= out
+    den += t(L * scale)
+    np.subtract(nir, red, out=out, dtype=out.dtype)
+    out *= t(G)
+    _masked_divide(out, den, out, finite_inputs)
+    np.clip(out, -1.0, 1.0, out=out)
+
+if HAS_NUMBA:
+    @njit(parallel=True, fastmath=_FASTMATH, error_model='numpy', cache=True)
+    def _evi_numba(red, nir, blue, out, G, C1, C2, L, scale):
+        for i in prange(out.size):
+            r = out.dtype.type(red[i]) / scale
+            n = out.dtype.type(nir[i]) / scale
+            b = out.dtype.type(blue[i]) / scale
+            v = G * (n - r) / (n + C1 * r - C2 * b + L)
+            if not np.isfinite(v):
+                v = 0.0
+            elif v < -1.0:
+                v = -1.0
+            elif v > 1.0:
+                v = 1.0
+            out[i] = v
+
+def evi(red: np.ndarray, nir: np.ndarray, blue: np.ndarray, out: np.ndarray,
+        G: float, C1: float, C2: float, L: float, scale: float = 1.0) -> np.ndarray:
+    """
+    Compute G * (NIR - RED) / (NIR + C1 * RED - C2 * BLUE + L) clipped to [-1, 1].
+    
+    Bands of any numeric dtype are converted to the dtype of `out` and
+    divided by `scale` per pixel. Non-finite results are set to 0.
+    
+    Args:
+        red: Red band array
+        nir: Near-infrared band array, same shape as `red`
+        blue: Blue band array, same shape as `red`
+        out: Contiguous floating point output array, same shape as `red`
+        G, C1, C2, L: EVI coefficients
+        scale: Reflectance scale factor the bands are divided by
+        
+    Returns:
+        The output array
+    """
+    if _use_numba(red, nir, blue):
+        t = out.dtype.type
+        with _threads_for(out.size):
+            _evi_numba(red.ravel(), nir.ravel(), blue.ravel(), out.reshape(-1),
+                       t(G), t(C1), t(C2), t(L), t(scale))
+        return out
+    return _tiled_apply(lambda r, n, b, o: _evi_numpy(r, n, b, o, G, C1, C2, L, scale),
+                        red, nir, blue, out=out)
+
+if HAS_NUMBA:
+    @njit(inline='always')
+    def _finite_clip(v):
+        # Map non-finite values to 0 and clip the rest to [-1, 1]
+        if not np.isfinite(v):
+            return 0.0
+        if v < -1.0:
+            return -1.0
+        if v > 1.0:
+            return 1.0
+        return v
+    
+    @njit(parallel=True, fastmath=_FASTMATH, error_model='numpy', cache=True)
+    def _vegetation_numba(nir, red, blue, ndvi_out, savi_out, evi_out, proto,
+                          L_savi, gain, G, C1, C2, L_evi, scale):
+        # Outputs that were not requested are None; numba compiles a
+        # separate version for each combination with those branches removed
+        t = proto.dtype.type
+        for i in prange(nir.size):
+            n = t(nir[i]) / scale
+            r = t(red[i]) / scale
+            d = n - r
+            s = n + r
+            if ndvi_out is not None:
+                ndvi_out[i] = _finite_clip(d / s)
+            if savi_out is not None:
+                savi_out[i] = _finite_clip(d / (s + L_savi) * gain)
+            if evi_out is not None:
+                b = t(blue[i]) / scale
+                evi_out[i] = _finite_clip(G * d / (n + C1 * r - C2 * b + L_evi))
+
+def vegetation_indices(nir: np.ndarray, red: np.ndarray, blue: Optional[np.ndarray],
+                       ndvi_out: Optional[np.ndarray], savi_out: Optional[np.ndarray],
+                       evi_out: Optional[np.ndarray], L_savi: float, G: float, C1: float,
+                       C2: float, L_evi: float, scale: float = 1.0) -> None:
+    """
+    Compute any of NDVI, SAVI and EVI in a single pass over the bands.
+    
+    Gives the same results as `normalized_difference`, `savi` and `evi`,
+    but each band is read from memory once for all requested indices.
+    Indices whose output is None are skipped.
+    
+    Args:
+        nir: Near-infrared band array
+        red: Red band array, same shape as `nir`
+        blue: Blue band array, same shape as `nir` (only used for EVI)
+        ndvi_out, savi_out, evi_out: Contiguous output arrays of one floating
+            point dtype, same shape as `nir`, or None
+        L_savi: SAVI soil brightness correction factor
+        G, C1, C2, L_evi: EVI coefficients
+        scale: Reflectance scale factor the bands are divided by
+    """
+    outs = [o for o in (ndvi_out, savi_out, evi_out) if o is not None]
+    if _use_numba(nir, red, red if blue is None else blue):
+        flat = [None if o is None else o.reshape(-1) for o in (ndvi_out, savi_out, evi_out)]
+        t = outs[0].dtype.type
+        with _threads_for(nir.size):
+            _vegetation_numba(nir.ravel(), red.ravel(), (red if blue is None else blue).ravel(),
+                              *flat, np.empty(1, dtype=outs[0].dtype), t(L_savi), t(1 + L_savi),
+                              t(G), t(C1), t(C2), t(L_evi), t(scale))
+        return
+    
+    def _tile(n, r, b, *tile_outs):
+        # All indices are computed while the band tiles are in cache
+        tile_outs = iter(tile_outs)
+        if ndvi_out is not None:
+            _nd_numpy(n, r, next(tile_outs), True)
+        if savi_out is not None:
+            _savi_numpy(n, r, next(tile_outs), L_savi, scale)
+        if evi_out is not None:
+            _evi_numpy(r, n, b, next(tile_outs), G, C1, C2, L_evi, scale)
+    
+    # The outputs are tiled like inputs and written through their views
+    _tiled_apply(_tile, nir, red, red if blue is None else blue, *outs[:-1], out=outs[-1])
+
+if HAS_NUMBA:
+    @njit(parallel=True, cache=True)
+    def _relabel_numba(labels, lut, out):
+        for i in prange(out.size):
+            out[i] = lut[labels[i]]
+
+def relabel(labels: np.ndarray, lut: np.ndarray, out: np.ndarray) -> np.ndarray:
+    """
+    Map every label through a lookup table, i.e. out = lut[labels].
+    
+    `out` may be `labels` itself to relabel in place.
+    
+    Args:
+        labels: Integer label array
+        lut: Lookup table indexed by label, with the dtype of `out`
+        out: Contiguous integer output array, same shape as `labels`
+        
+    Returns:
+        The output array
+    """
+    if HAS_NUMBA:
+        with _threads_for(out.size):
+            _relabel_numba(labels.ravel(), lut, out.reshape(-1))
+        return out
+    return np.take(lut, labels, out=out)
+
+if HAS_NUMBA:
+    @njit(parallel=True, cache=True)
+    def _change_numba(m1, m2, change, stable):
+        n_first = 0
+        n_second = 0
+        n_both = 0
+        for i in prange(m1.size):
+            a = np.int64(m1[i])
+            b = np.int64(m2[i])
+            change[i] = b - a
+            stable[i] = a & b
+            n_first += a
+            n_second += b
+            n_both += a & b
+        return n_first, n_second, n_both
+
+def change_summary(mask1: np.ndarray, mask2: np.ndarray,
+                   change: np.ndarray, stable: np.ndarray) -> Tuple[int, int, int]:
+    """
+    Compare two boolean masks in a single pass.
+    
+    Writes mask2 - mask1 (1: gained, -1: lost, 0: no change) into `change`
+    and mask1 & mask2 into `stable`.
+    
+    Args:
+        mask1: First boolean mask
+        mask2: Second boolean mask, same shape as `mask1`
+        change: Contiguous integer output array, same shape as `mask1`
+        stable: Contiguous boolean output array, same shape as `mask1`
+        
+    Returns:
+        Tuple of (gained pixels, lost pixels, pixels in mask1)
+    """
+    if HAS_NUMBA:
+        with _threads_for(mask1.size):
+            n_first, n_second, n_both = _change_numba(
+                mask1.view(np.uint8).ravel(), mask2.view(np.uint8).ravel(),
+                change.reshape(-1), stable.view(np.uint8).reshape(-1))
+    else:
+        np.subtract(mask2, mask1, out=change, dtype=change.dtype)
+        np.logical_and(mask1, mask2, out=stable)
+        n_first = np.count_nonzero(mask1)
+        n_second = np.count_nonzero(mask2)
+        n_both = np.count_nonzero(stable)
+    return int(n_second - n_both), int(n_first - n_both), int(n_first)
+
+if HAS_NUMBA:
+    @njit(cache=True)
+    def _find(parent, x):
+        # Path halving
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+    
+    @njit(cache=True)
+    def _union(parent, a, b):
+        # The smaller label becomes the root, so every root is the label
+        # assigned at its component's first pixel in raster order
+        a = _find(parent, a)
+        b = _find(parent, b)
+        if a < b:
+            parent[b] = a
+        elif b < a:
+            parent[a] = b
+    
+    @njit(parallel=True, cache=True)
+    def _label_numba(mask, labels, parent, n_strips):
+        height, width = mask.shape
+        rows_per_strip = (height + n_strips - 1) // n_strips
+        
+        # Pass 1: provisional labels per strip of rows. Labels of a strip
+        # start at its first pixel's index, so strips never share labels
+        for s in prange(n_strips):
+            row_start = s * rows_per_strip
+            row_stop = min(row_start + rows_per_strip, height)
+            next_label = row_start * width + 1
+            for i in range(row_start, row_stop):
+                for j in range(width):
+                    if not mask[i, j]:
+                        labels[i, j] = 0
+                        continue
+                    up = labels[i - 1, j] if i > row_start else 0
+                    left = labels[i, j - 1] if j > 0 else 0
+                    if up == 0 and left == 0:
+                        parent[next_label] = next_label
+                        labels[i, j] = next_label
+                        next_label += 1
+                    elif up == 0:
+                        labels[i, j] = left
+                    elif left == 0 or left == up:
+                        labels[i, j] = up
+                    else:
+                        labels[i, j] = min(up, left)
+                        _union(parent, up, left)
+        
+        # Merge components across strip boundaries
+        for s in range(1, n_strips):
+            i = s * rows_per_strip
+            if i >= height:
+                break
+            for j in range(width):
+                if labels[i, j] != 0 and labels[i - 1, j] != 0:
+                    _union(parent, labels[i - 1, j], labels[i, j])
+        
+        # Number the roots consecutively in raster order. parent[x] < x for
+        # every non-root, so its final label is already known
+        num = 0
+        for x in range(1, parent.size):
+            p = parent[x]
+            if p == x:
+                num += 1
+                parent[x] = num
+            elif p != 0:
+                parent[x] = parent[p]
+        
+        # Pass 2: rewrite provisional labels with final labels
+        for i in prange(height):
+            for j in range(width):
+                labels[i, j] = parent[labels[i, j]]
+        return num
+
+def label(mask: np.ndarray, n_strips: Optional[int] = None) -> Tuple[np.ndarray, int]:
+    """
+    Label 4-connected components of a 2D boolean mask.
+    
+    Labels are numbered from 1 in order of each component's first pixel in
+    raster order, the same as scipy.ndimage.label with its default
+    structuring element. With numba the mask is labelled in parallel strips
+    of rows that are merged along their boundaries.
+    
+    Args:
+        mask: 2D boolean mask
+        n_strips: Number of row strips (default: number of numba threads
+            used for the mask's size)
+        
+    Returns:
+        Tuple of (int32 label array, number of components)
+    """
+    if not HAS_NUMBA or mask.ndim != 2 or mask.size >= np.iinfo(np.int32).max:
+        return ndimage.label(mask)
+    
+    labels = np.empty(mask.shape, dtype=np.int32)
+    parent = np.zeros(mask.size + 1, dtype=np.int32)
+    with _threads_for(mask.size):
+        if n_strips is None:
+            n_strips = get_num_threads()
+        n_strips = max(1, min(n_strips, mask.shape[0]))
+        num = _label_numba(np.ascontiguousarray(mask, dtype=bool), labels, parent, n_strips)
+    return labels, int(num)
+
+if HAS_NUMBA:
+    @njit(inline='always')
+    def _bin_index(v, edges, first, scale):
+        # Same bin assignment as np.histogram: estimate the bin, then
+        # correct it against the edges (the last bin is closed)
+        bins = edges.size - 1
+        k = int((v - first) * scale)
+        if k >= bins:
+            k = bins - 1
+        elif k < 0:
+            k = 0
+        if v < edges[k]:
+            k -= 1
+        elif k != bins - 1 and v >= edges[k + 1]:
+            k += 1
+        return k
+    
+    @njit(parallel=True, cache=True)
+    def _histogram_numba(x, edges, n_chunks):
+        bins = edges.size - 1
+        first = edges[0]
+        last = edges[bins]
+        scale = bins / (last - first)
+        chunk = (x.size + n_chunks - 1) // n_chunks
+        counts = np.zeros((n_chunks, bins), dtype=np.int64)
+        for c in prange(n_chunks):
+            for i in range(c * chunk, min((c + 1) * chunk, x.size)):
+                v = np.float64(x[i])
+                if v >= first and v <= last:
+                    counts[c, _bin_index(v, edges, first, scale)] += 1
+        return counts.sum(axis=0)
+    
+    @njit(parallel=True, cache=True)
+    def _summary_numba(x):
+        n_valid = 0
+        n_nan = 0
+        n_posinf = 0
+        n_neginf = 0
+        n_zero = 0
+        total = 0.0
+        lo = np.inf
+        hi = -np.inf
+        for i in prange(x.size):
+            v = np.float64(x[i])
+            if np.isnan(v):
+                n_nan += 1
+            elif v == np.inf:
+                n_posinf += 1
+            elif v == -np.inf:
+                n_neginf += 1
+            else:
+                n_valid += 1
+                total += v
+                lo = min(lo, v)
+                hi = max(hi, v)
+                if v == 0.0:
+                    n_zero += 1
+        return n_valid, n_nan, n_posinf, n_neginf, n_zero, total, lo, hi
+    
+    @njit(parallel=True, cache=True)
+    def _moments_numba(x, mean, edges, n_chunks):
+        bins = edges.size - 1
+        first = edges[0]
+        scale = bins / (edges[bins] - edges[0])
+        chunk = (x.size + n_chunks - 1) // n_chunks
+        partial = np.zeros((n_chunks, 3))
+        counts = np.zeros((n_chunks, bins), dtype=np.int64)
+        for c in prange(n_chunks):
+            m2 = 0.0
+            m3 = 0.0
+            m4 = 0.0
+            for i in range(c * chunk, min((c + 1) * chunk, x.size)):
+                v = np.float64(x[i])
+                if not np.isfinite(v):
+                    continue
+                d = v - mean
+                d2 = d * d
+                m2 += d2
+                m3 += d2 * d
+                m4 += d2 * d2
+                
+                counts[c, _bin_index(v, edges, first, scale)] += 1
+            partial[c, 0] = m2
+            partial[c, 1] = m3
+            partial[c, 2] = m4
+        totals = partial.sum(axis=0)
+        return totals[0], totals[1], totals[2], counts.sum(axis=0)
+
+if HAS_NUMBA:
+    @njit(parallel=True, fastmath=_FASTMATH, cache=True)
+    def _mean_std_numba(x, n_chunks, block):
+        chunk = (x.size + n_chunks - 1) // n_chunks
+        partial = np.zeros((n_chunks, 5))
+        for c in prange(n_chunks):
+            n = 0.0
+            mean = 0.0
+            m2 = 0.0
+            n_posinf = 0
+            n_neginf = 0
+            stop = min((c + 1) * chunk, x.size)
+            for start in range(c * chunk, stop, block):
+                end = min(start + block, stop)
+                # Mean and squared deviations of the finite values of the
+                # block, whose second pass reads from cache. NaN and Inf are
+                # skipped with selects rather than branches so that the
+                # loops vectorize; infinities are only counted
+                nb = 0
+                total = 0.0
+                for i in range(start, end):
+                    v = np.float64(x[i])
+                    valid = v - v == 0.0
+                    nb += valid
+                    total += v if valid else 0.0
+                    n_posinf += v == np.inf
+                    n_neginf += v == -np.inf
+                if nb == 0:
+                    continue
+                mb = total / nb
+                sb = 0.0
+                for i in range(start, end):
+                    v = np.float64(x[i])
+                    d = v - mb
+                    sb += d * d if v - v == 0.0 else 0.0
+                # Chan et al. update for merging two partitions
+                delta = mb - mean
+                merged = n + nb
+                m2 += sb + delta * delta * n * nb / merged
+                mean += delta * nb / merged
+                n = merged
+            partial[c, 0] = n
+            partial[c, 1] = mean
+            partial[c, 2] = m2
+            partial[c, 3] = n_posinf
+            partial[c, 4] = n_neginf
+        n = 0.0
+        mean = 0.0
+        m2 = 0.0
+        for c in range(n_chunks):
+            nb = partial[c, 0]
+            if nb == 0:
+                continue
+            delta = partial[c, 1] - mean
+            merged = n + nb
+            m2 += partial[c, 2] + delta * delta * n * nb / merged
+            mean += delta * nb / merged
+            n = merged
+        return n, mean, m2, partial[:, 3].sum(), partial[:, 4].sum()
+
+if HAS_NUMBA:
+    @njit(parallel=True, fastmath=_FASTMATH, cache=True)
+    def _mean_numba(x):
+        n = 0
+        total = 0.0
+        n_posinf = 0
+        n_neginf = 0
+        for i in prange(x.size):
+            v = np.float64(x[i])
+            valid = v - v == 0.0
+            n += valid
+            total += v if valid else 0.0
+            n_posinf += v == np.inf
+            n_neginf += v == -np.inf
+        return n, total, n_posinf, n_neginf
+
+def mean(x: np.ndarray) -> float:
+    """
+    Mean of an array ignoring NaN, as np.nanmean with a float64 accumulator.
+    
+    Args:
+        x: Numeric array
+        
+    Returns:
+        The mean; NaN if all values are NaN, infinite if there are infinite
+        values (NaN if both signs occur)
+    """
+    if _use_numba(x):
+        with _threads_for(x.size):
+            n, total, n_posinf, n_neginf = _mean_numba(x.ravel())
+        if n_posinf and n_neginf:
+            return np.nan
+        if n_posinf or n_neginf:
+            return np.inf if n_posinf else -np.inf
+        return float(total / n) if n else np.nan
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return float(np.nanmean(x, dtype=np.float64))
+
+def mean_std(x: np.ndarray) -> Tuple[float, float]:
+    """
+    Mean and standard deviation of an array ignoring NaN, in one pass.
+    
+    The compiled kernel merges per-block means and squared deviations with
+    the pairwise update of Chan et al., which is as accurate as a two-pass
+    calculation while reading the array from memory once.
+    
+    Args:
+        x: Numeric array
+        
+    Returns:
+        Tuple of (mean, population standard deviation), as np.nanmean and
+        np.nanstd: both NaN if all values are NaN, and with infinite values
+        the mean is infinite (NaN if both signs occur) and the standard
+        deviation NaN
+    """
+    if _use_numba(x):
+        with _threads_for(x.size):
+            n, mean, m2, n_posinf, n_neginf = _mean_std_numba(x.ravel(), get_num_threads(), 4096)
+        # Infinities are counted rather than merged, where inf - inf would
+        # turn the running mean into NaN depending on their position
+        if n_posinf and n_neginf:
+            return np.nan, np.nan
+        if n_posinf or n_neginf:
+            return (np.inf if n_posinf else -np.inf), np.nan
+        if n == 0:
+            return np.nan, np.nan
+        return float(mean), float(np.sqrt(m2 / n))
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return float(np.nanmean(x, dtype=np.float64)), float(np.nanstd(x, dtype=np.float64))
+
+def summary(x: np.ndarray) -> Tuple[int, int, int, int, int, float, float, float]:
+    """
+    Count and reduce the values of an array in a single pass.
+    
+    Args:
+        x: Numeric array
+        
+    Returns:
+        Tuple of (finite values, NaN values, +inf values, -inf values,
+        zero values, sum of finite values, minimum finite value,
+        maximum finite value). The minimum and maximum are +inf and -inf
+        when there are no finite values
+    """
+    if _use_numba(x):
+        with _threads_for(x.size):
+            result = _summary_numba(x.ravel())
+        return tuple(int(v) for v in result[:5]) + tuple(float(v) for v in result[5:])
+    
+    finite = np.isfinite(x)
+    values = x[finite]
+    n_nan = int(np.count_nonzero(np.isnan(x)))
+    n_posinf = int(np.count_nonzero(x == np.inf))
+    n_neginf = x.size - values.size - n_nan - n_posinf
+    if values.size == 0:
+        return 0, n_nan, n_posinf, n_neginf, 0, 0.0, np.inf, -np.inf
+    return (values.size, n_nan, n_posinf, n_neginf, values.size - np.count_nonzero(values),
+            float(np.sum(values, dtype=np.float64)), float(values.min()), float(values.max()))
+
+def minmax(x: np.ndarray) -> Tuple[float, float]:
+    """
+    Minimum and maximum of an array ignoring NaN.
+    
+    Args:
+        x: Numeric array
+        
+    Returns:
+        Tuple of (minimum, maximum), both NaN if all values are NaN
+    """
+    # fmin/fmax skip NaN without the copies and warnings of nanmin/nanmax,
+    # and vectorize better than a fused numba loop with a NaN branch
+    return float(np.fmin.reduce(x, axis=None)), float(np.fmax.reduce(x, axis=None))
+
+def histogram(x: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """
+    Count the values of an array in uniform bins, without copying it.
+    
+    Gives the same counts as np.histogram(x, bins=edges). Values outside
+    the edges, including NaN and infinite values, are not counted.
+    
+    Args:
+        x: Numeric array
+        edges: Uniform bin edges, e.g. from np.histogram_bin_edges
+        
+    Returns:
+        int64 array of counts per bin
+    """
+    edges = np.asarray(edges, dtype=np.float64)
+    if _use_numba(x):
+        with _threads_for(x.size):
+            return _histogram_numba(x.ravel(), edges, get_num_threads())
+    counts, _ = np.histogram(x, bins=edges.size - 1, range=(edges[0], edges[-1]))
+    return counts
+
+def moments(x: np.ndarray, mean: float, edges: np.ndarray) -> Tuple[float, float, float, np.ndarray]:
+    """
+    Sum the central moments and histogram of the finite values in one pass.
+    
+    Args:
+        x: Numeric array
+        mean: Mean of the finite values
+        edges: Uniform histogram bin edges covering the finite values
+        
+    Returns:
+        Tuple of (sum of squared, cubed and fourth-power deviations from
+        the mean, histogram counts)
+    """
+    edges = np.asarray(edges, dtype=np.float64)
+    if _use_numba(x):
+        with _threads_for(x.size):
+            m2, m3, m4, counts = _moments_numba(x.ravel(), mean, edges, get_num_threads())
+        return float(m2), float(m3), float(m4), counts
+    
+    values = x[np.isfinite(x)].astype(np.float64).ravel()
+    d = values - mean
+    d2 = d * d
+    counts, _ = np.histogram(values, bins=edges)
+    return float(d2.sum()), float((d2 * d).sum()), float((d2 * d2).sum()), counts
+
+def precompile() -> None:
+    """
+    Compile the numba kernels for the common input dtypes.
+    
+    Kernels are compiled lazily on first call and cached on disk, so
+    running this once (e.g. after installation or in CI) removes the JIT
+    delay from the first call of later runs. Does nothing when numba is
+    not installed.
+    """
+    if not HAS_NUMBA:
+        return
+    
+    shape = (4, 4)
+    for out_dtype in (np.float32, np.float64):
+        out = np.empty(shape, dtype=out_dtype)
+        for in_dtype in (np.uint8, np.uint16, np.int16, np.float32, np.float64):
+            band = np.ones(shape, dtype=in_dtype)
+            for clip in (True, False):
+                normalized_difference(band, band, out, clip)
+            normalized_difference_q8(band, band, np.empty(shape, dtype=np.int8), out_dtype)
+            savi(band, band, out, 0.5, 10000.0)
+            evi(band, band, band, out, 2.5, 6.0, 7.5, 1.0, 10000.0)
+            for ndvi_out, savi_out, evi_out in ((out, out, out), (out, out, None),
+                                                (out, None, out), (None, out, out)):
+                vegetation_indices(band, band, band, ndvi_out, savi_out, evi_out,
+                                   0.5, 2.5, 6.0, 7.5, 1.0, 10000.0)
+            for threshold in (0.0, 0.5):
+                normalized_difference_count(band, band, threshold, out_dtype)
+            if out_dtype is np.float32:
+                summary(band)
+                mean(band)
+                mean_std(band)
+                moments(band, 1.0, np.linspace(0.5, 1.5, 3))
+                histogram(band, np.linspace(0.5, 1.5, 3))
+    
+    mask = np.eye(4, dtype=bool)
+    labels, num = label(mask)
+    relabel(labels, np.arange(num + 1, dtype=labels.dtype), np.empty_like(labels))
+    change_summary(mask, mask, np.empty(shape, dtype=int), np.empty(shape, dtype=bool))
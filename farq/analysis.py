@@ -6,13 +6,113 @@ This module provides functions for:
 - Change detection between water masks
 - Individual water body identification and analysis
 - Water body shape and morphology analysis
+- Bit-packed water masks
 
 All functions include input validation and detailed error messages.
 """
 import numpy as np
-from typing import Dict, Union, Tuple, Optional, List
+from typing import Dict, Union, Tuple, Optional, List, Iterator
 from scipy import ndimage
-from .utils import sum
+from . import _kernels
+from .indices import ndwi, validate_bands, _working_dtype, _is_cupy, _is_dask
+
+# Number of set bits in each byte value, used when np.bitwise_count is unavailable
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+class BitMask:
+    """
+    Boolean mask packed to one bit per pixel in uint64 words.
+    
+    Water masks only need one bit per pixel, so packing them cuts memory
+    and bandwidth 8x compared to numpy bool arrays. Set operations work on
+    64 pixels per word and pixel counts use a popcount instead of a sum.
+    BitMask objects are accepted wherever the analysis functions take a
+    water mask.
+    
+    Example:
+        >>> before = farq.BitMask(ndwi_1 > 0)
+        >>> after = farq.BitMask(ndwi_2 > 0)
+        >>> gained_pixels = (after & ~before).count()
+    """
+    
+    def __init__(self, mask: np.ndarray):
+        """
+        Pack a mask into bits.
+        
+        Args:
+            mask: Boolean mask (nonzero values are treated as True)
+            
+        Raises:
+            TypeError: If mask is not a numpy array
+            ValueError: If mask is empty
+        """
+        if not isinstance(mask, np.ndarray):
+            raise TypeError("mask must be a numpy array")
+        if mask.size == 0:
+            raise ValueError("mask cannot be empty")
+        
+        packed = np.packbits(mask.astype(bool, copy=False), axis=None, bitorder='little')
+        self.words = np.zeros(-(-packed.size // 8), dtype=np.uint64)
+        self.words.view(np.uint8)[:packed.size] = packed
+        self.shape = mask.shape
+    
+    @classmethod
+    def _from_words(cls, words: np.ndarray, shape: Tuple[int, ...]) -> "BitMask":
+        """Wrap already packed words without copying."""
+        bitmask = cls.__new__(cls)
+        bitmask.words = words
+        bitmask.shape = shape
+        return bitmask
+    
+    @property
+    def size(self) -> int:
+        """Number of pixels in the mask."""
+        return int(np.prod(self.shape))
+    
+    def count(self) -> int:
+        """Number of True pixels."""
+        if hasattr(np, "bitwise_count"):
+            return int(np.bitwise_count(self.words).sum())
+        return int(_POPCOUNT8[self.words.view(np.uint8)].sum())
+    
+    def to_array(self) -> np.ndarray:
+        """Unpack to a numpy bool array with the original shape."""
+        bits = np.unpackbits(self.words.view(np.uint8), count=self.size, bitorder='little')
+        return bits.view(bool).reshape(self.shape)
+    
+    def _check(self, other: "BitMask") -> None:
+        if not isinstance(other, BitMask):
+            raise TypeError("Operand must be a BitMask")
+        if other.shape != self.shape:
+            raise ValueError(f"Mask shapes do not match: {self.shape} != {other.shape}")
+    
+    def __and__(self, other: "BitMask") -> "BitMask":
+        self._check(other)
+        return BitMask._from_words(self.words & other.words, self.shape)
+    
+    def __or__(self, other: "BitMask") -> "BitMask":
+        self._check(other)
+        return BitMask._from_words(self.words | other.words, self.shape)
+    
+    def __xor__(self, other: "BitMask") -> "BitMask":
+        self._check(other)
+        return BitMask._from_words(self.words ^ other.words, self.shape)
+    
+    def __invert__(self) -> "BitMask":
+        words = ~self.words
+        
+        # Keep the padding bits after the last pixel cleared
+        padding = words.view(np.uint8)
+        n_bytes, n_bits = divmod(self.size, 8)
+        if n_bits:
+            padding[n_bytes] &= (1 << n_bits) - 1
+            n_bytes += 1
+        padding[n_bytes:] = 0
+        return BitMask._from_words(words, self.shape)
+    
+    def __repr__(self) -> str:
+        return f"BitMask(shape={self.shape}, count={self.count()})"
+
 
 def calculate_shape_metrics(water_body_mask: np.ndarray) -> Dict[str, float]:
     """
@@ -34,7 +134,7 @@ def calculate_shape_metrics(water_body_mask: np.ndarray) -> Dict[str, float]:
     perimeter = np.sum(np.sqrt(gradient_x**2 + gradient_y**2))
     
     # Calculate area
-    area = np.sum(water_body_mask)
+    area = np.count_nonzero(water_body_mask)
     
     # Calculate compactness (normalized to [0,1])
     compactness = 4 * np.pi * area / (perimeter**2) if perimeter > 0 else 0
@@ -67,7 +167,24 @@ def calculate_shape_metrics(water_body_mask: np.ndarray) -> Dict[str, float]:
         'orientation': float(orientation)
     }
 
-def water_stats(water_mask: np.ndarray, 
+def _body_masks(labeled_mask: np.ndarray, num_features: int) -> Iterator[np.ndarray]:
+    """
+    Yield a binary mask of each labeled water body, in label order.
+    
+    Each mask covers only the body's bounding box (from a single
+    `ndimage.find_objects` pass) instead of comparing the whole labeled
+    array against every label. The box is padded by 2 pixels so that
+    gradient-based perimeters match the full-array result.
+    """
+    for i, box in enumerate(ndimage.find_objects(labeled_mask, max_label=num_features), 1):
+        box = tuple(slice(max(s.start - 2, 0), s.stop + 2) for s in box)
+        yield labeled_mask[box] == i
+
+def _body_shape_metrics(labeled_mask: np.ndarray, num_features: int) -> List[Dict[str, float]]:
+    """Calculate shape metrics for every labeled water body."""
+    return [calculate_shape_metrics(body) for body in _body_masks(labeled_mask, num_features)]
+
+def water_stats(water_mask: Union[np.ndarray, BitMask], 
                pixel_size: Union[float, Tuple[float, float]] = 30.0,
                calculate_shapes: bool = False) -> Dict[str, Union[float, Dict]]:
     """
@@ -75,6 +192,7 @@ def water_stats(water_mask: np.ndarray,
     
     Args:
         water_mask: Binary water mask (True/1 for water, False/0 for non-water)
+            or a BitMask
         pixel_size: Pixel size in meters. Default 30.0 (Landsat resolution)
             Can be a single float for square pixels or a tuple (width, height)
         calculate_shapes: Whether to calculate shape metrics for water bodies
@@ -92,6 +210,12 @@ def water_stats(water_mask: np.ndarray,
         TypeError: If inputs have incorrect types
         ValueError: If water_mask is empty or pixel_size is invalid
     """
+    # Count water pixels directly on the packed bits
+    total_pixels = None
+    if isinstance(water_mask, BitMask):
+        total_pixels = water_mask.count()
+        water_mask = water_mask.to_array()
+    
     # Input validation
     if not isinstance(water_mask, np.ndarray):
         raise TypeError("water_mask must be a numpy array")
@@ -111,20 +235,21 @@ def water_stats(water_mask: np.ndarray,
     else:
         raise TypeError("pixel_size must be a number or tuple of two numbers")
     
-    # Convert to binary mask
-    mask = water_mask.astype(bool)
+    # Convert to binary mask (no copy when it is already boolean)
+    mask = water_mask.astype(bool, copy=False)
     
     # Label water bodies
-    labeled_mask, num_features = ndimage.label(mask)
+    labeled_mask, num_features = _kernels.label(mask)
     
     # Calculate basic statistics
-    total_pixels = np.sum(mask)
+    if total_pixels is None:
+        total_pixels = np.count_nonzero(mask)
     total_area = total_pixels * pixel_area
     coverage = (total_pixels / mask.size) * 100
     
     # Calculate water body sizes
     if num_features > 0:
-        body_sizes = np.bincount(labeled_mask[labeled_mask > 0]) * pixel_area
+        body_sizes = np.bincount(labeled_mask.ravel(), minlength=num_features + 1)[1:] * pixel_area
         mean_body_size = np.mean(body_sizes)
         largest_body = np.max(body_sizes)
     else:
@@ -141,11 +266,7 @@ def water_stats(water_mask: np.ndarray,
     
     # Calculate shape metrics if requested
     if calculate_shapes and num_features > 0:
-        shape_metrics = []
-        for i in range(1, num_features + 1):
-            body_mask = labeled_mask == i
-            metrics = calculate_shape_metrics(body_mask)
-            shape_metrics.append(metrics)
+        shape_metrics = _body_shape_metrics(labeled_mask, num_features)
         
         # Add summary of shape metrics
         stats_dict["shape_metrics"] = {
@@ -156,16 +277,68 @@ def water_stats(water_mask: np.ndarray,
     
     return stats_dict
 
-def water_change(mask1: np.ndarray, 
-                mask2: np.ndarray,
+def water_area_from_bands(green: np.ndarray,
+                          nir: np.ndarray,
+                          pixel_size: Union[float, Tuple[float, float]] = 30.0,
+                          threshold: float = 0.0) -> float:
+    """
+    Calculate water surface area directly from green and NIR bands.
+    
+    Equivalent to water_stats(ndwi(green, nir) > threshold)["total_area"],
+    but water pixels are counted in a single pass over the bands without
+    creating the NDWI array or the water mask. With the default threshold
+    of 0 only the sign of the difference is tested, so nothing is divided.
+    Cupy and dask bands are thresholded through `ndwi`, on the GPU or
+    block by block.
+    
+    Args:
+        green: Green band array (B3 in Landsat 8)
+        nir: Near-infrared band array (B5 in Landsat 8)
+        pixel_size: Pixel size in meters. Default 30.0 (Landsat resolution)
+            Can be a single float for square pixels or a tuple (width, height)
+        threshold: NDWI threshold above which a pixel counts as water
+        
+    Returns:
+        Water surface area in square kilometers
+        
+    Raises:
+        TypeError: If inputs have incorrect types
+        ValueError: If bands are empty or have different shapes, or pixel_size is invalid
+    """
+    green, nir = validate_bands(green, nir)
+    
+    if isinstance(pixel_size, (int, float)):
+        if pixel_size <= 0:
+            raise ValueError("Pixel size must be positive")
+        pixel_area = (pixel_size * pixel_size) / 1_000_000  # Convert to km²
+    elif isinstance(pixel_size, tuple):
+        if len(pixel_size) != 2:
+            raise ValueError("pixel_size tuple must have exactly 2 elements")
+        if any(p <= 0 for p in pixel_size):
+            raise ValueError("Pixel sizes must be positive")
+        pixel_area = (pixel_size[0] * pixel_size[1]) / 1_000_000  # Convert to km²
+    else:
+        raise TypeError("pixel_size must be a number or tuple of two numbers")
+    
+    if _is_cupy(green, nir) or _is_dask(green, nir):
+        # Threshold the NDWI on the GPU or block by block, like indices.ndwi
+        water_pixels = int((ndwi(green, nir) > threshold).sum())
+    else:
+        # NDWI = (NIR - GREEN) / (NIR + GREEN), same order as indices.ndwi
+        water_pixels = _kernels.normalized_difference_count(nir, green, threshold,
+                                                            _working_dtype(green, nir))
+    return water_pixels * pixel_area
+
+def water_change(mask1: Union[np.ndarray, BitMask], 
+                mask2: Union[np.ndarray, BitMask],
                 pixel_size: Union[float, Tuple[float, float]] = 30.0,
                 min_change_area: Optional[float] = None) -> Dict[str, Union[float, np.ndarray]]:
     """
     Analyze changes between two water masks.
     
     Args:
-        mask1: First water mask (True/1 for water)
-        mask2: Second water mask (True/1 for water)
+        mask1: First water mask (True/1 for water) or BitMask
+        mask2: Second water mask (True/1 for water) or BitMask
         pixel_size: Pixel size in meters
             Can be a single float for square pixels or a tuple (width, height)
         min_change_area: Minimum area (in square meters) to consider as change
@@ -184,6 +357,13 @@ def water_change(mask1: np.ndarray,
         TypeError: If inputs have incorrect types
         ValueError: If masks have different shapes or pixel_size is invalid
     """
+    # The change mask and stable water outputs are full arrays, so packed
+    # masks are unpacked once and compared in a single pass
+    if isinstance(mask1, BitMask):
+        mask1 = mask1.to_array()
+    if isinstance(mask2, BitMask):
+        mask2 = mask2.to_array()
+    
     # Input validation
     if not isinstance(mask1, np.ndarray) or not isinstance(mask2, np.ndarray):
         raise TypeError("Masks must be numpy arrays")
@@ -205,36 +385,42 @@ def water_change(mask1: np.ndarray,
     else:
         raise TypeError("pixel_size must be a number or tuple of two numbers")
     
-    # Convert to binary masks
-    mask1 = mask1.astype(bool)
-    mask2 = mask2.astype(bool)
-    
-    # Calculate changes
-    gained = np.logical_and(~mask1, mask2)
-    lost = np.logical_and(mask1, ~mask2)
-    stable = np.logical_and(mask1, mask2)
+    # Convert to binary masks (no copy when they are already boolean)
+    mask1 = mask1.astype(bool, copy=False)
+    mask2 = mask2.astype(bool, copy=False)
     
-    # Filter small changes if requested
-    if min_change_area is not None:
+    if min_change_area is None:
+        # Change mask, stable water and pixel counts in a single pass
+        change_mask = np.empty(mask1.shape, dtype=int)
+        stable = np.empty(mask1.shape, dtype=bool)
+        n_gained, n_lost, n_original = _kernels.change_summary(mask1, mask2, change_mask, stable)
+    else:
+        # Calculate changes (on booleans, a > b is a & ~b without the inverted copy)
+        gained = np.greater(mask2, mask1)
+        lost = np.greater(mask1, mask2)
+        stable = np.logical_and(mask1, mask2)
+        
+        # Filter small changes
         min_pixels = min_change_area / (pixel_area * 1_000_000)
         gained = ndimage.binary_opening(gained, structure=np.ones((3,3)), iterations=int(min_pixels**0.5))
         lost = ndimage.binary_opening(lost, structure=np.ones((3,3)), iterations=int(min_pixels**0.5))
+        
+        # Create change mask (-1: lost, 0: no change, 1: gained)
+        change_mask = np.subtract(gained, lost, dtype=int)
+        n_gained, n_lost, n_original = np.count_nonzero(gained), np.count_nonzero(lost), np.count_nonzero(mask1)
     
     # Calculate areas
-    gained_area = np.sum(gained) * pixel_area
-    lost_area = np.sum(lost) * pixel_area
+    gained_area = n_gained * pixel_area
+    lost_area = n_lost * pixel_area
     net_change = gained_area - lost_area
     
     # Calculate percentage change
-    original_area = np.sum(mask1) * pixel_area
+    original_area = n_original * pixel_area
     if original_area > 0:
         change_percent = (net_change / original_area) * 100
     else:
         change_percent = float('inf') if gained_area > 0 else 0
     
-    # Create change mask (-1: lost, 0: no change, 1: gained)
-    change_mask = gained.astype(int) - lost.astype(int)
-    
     return {
         "gained_area": gained_area,  # km²
         "lost_area": lost_area,  # km²
@@ -244,7 +430,7 @@ def water_change(mask1: np.ndarray,
         "stable_water": stable
     }
 
-def get_water_bodies(water_mask: np.ndarray,
+def get_water_bodies(water_mask: Union[np.ndarray, BitMask],
                     pixel_size: Union[float, Tuple[float, float]] = 30.0,
                     min_area: Optional[float] = None,
                     calculate_shapes: bool = False) -> Tuple[np.ndarray, Dict[int, Dict]]:
@@ -252,7 +438,7 @@ def get_water_bodies(water_mask: np.ndarray,
     Label individual water bodies and calculate their characteristics.
     
     Args:
-        water_mask: Binary water mask
+        water_mask: Binary water mask or BitMask
         pixel_size: Pixel size in meters
             Can be a single float for square pixels or a tuple (width, height)
         min_area: Minimum water body area in square meters (optional)
@@ -261,7 +447,9 @@ def get_water_bodies(water_mask: np.ndarray,
         
     Returns:
         Tuple containing:
-            - Labeled array where each water body has a unique integer ID
+            - Labeled array where each water body has a unique integer ID,
+              in the smallest signed integer type (at least int16) that
+              holds the number of bodies
             - Dictionary mapping water body IDs to their characteristics:
                 - area: Area in square kilometers
                 - perimeter: Perimeter length (if calculate_shapes=True)
@@ -273,6 +461,9 @@ def get_water_bodies(water_mask: np.ndarray,
         TypeError: If inputs have incorrect types
         ValueError: If water_mask is empty or pixel_size is invalid
     """
+    if isinstance(water_mask, BitMask):
+        water_mask = water_mask.to_array()
+    
     # Input validation
     if not isinstance(water_mask, np.ndarray):
         raise TypeError("water_mask must be a numpy array")
@@ -292,38 +483,37 @@ def get_water_bodies(water_mask: np.ndarray,
     else:
         raise TypeError("pixel_size must be a number or tuple of two numbers")
     
-    # Convert to binary mask
-    mask = water_mask.astype(bool)
+    # Convert to binary mask (no copy when it is already boolean)
+    mask = water_mask.astype(bool, copy=False)
     
-    # Label water bodies
-    labeled_mask, num_features = ndimage.label(mask)
+    # Label water bodies and count pixels per label in a single pass
+    labeled_mask, num_features = _kernels.label(mask)
+    pixel_counts = np.bincount(labeled_mask.ravel(), minlength=num_features + 1)
     
     if min_area is not None:
         min_pixels = min_area / (pixel_area * 1_000_000)  # Convert min_area to pixels
-        # Calculate areas in one go
-        areas = np.bincount(labeled_mask.ravel())[1:]  # Skip background (0)
-        valid_labels = np.where(areas >= min_pixels)[0] + 1  # +1 because labels start at 1
+        valid_labels = np.flatnonzero(pixel_counts[1:] >= min_pixels) + 1  # +1 because labels start at 1
         
-        # Create mapping array
-        label_map = np.zeros(num_features + 1, dtype=int)
+        # Create mapping array in the smallest integer type that holds the
+        # remaining labels, and relabel the mask into it (in place when
+        # the type does not shrink)
+        label_dtype = np.promote_types(np.min_scalar_type(-len(valid_labels)), np.int16)
+        label_map = np.zeros(num_features + 1, dtype=label_dtype)
         label_map[valid_labels] = np.arange(1, len(valid_labels) + 1)
+        out = labeled_mask if label_dtype == labeled_mask.dtype else np.empty(labeled_mask.shape, dtype=label_dtype)
+        labeled_mask = _kernels.relabel(labeled_mask, label_map, out)
         
-        # Relabel the mask
-        labeled_mask = label_map[labeled_mask]
+        pixel_counts = np.concatenate(([0], pixel_counts[valid_labels]))
         num_features = len(valid_labels)
+    else:
+        # Same dtype as after filtering, so it does not depend on min_area
+        label_dtype = np.promote_types(np.min_scalar_type(-num_features), np.int16)
+        labeled_mask = labeled_mask.astype(label_dtype, copy=False)
     
     # Calculate characteristics for each water body
-    characteristics = {}
-    for i in range(1, num_features + 1):
-        body_mask = labeled_mask == i
-        area = np.sum(body_mask) * pixel_area
-        
-        body_stats = {"area": area}
-        
-        if calculate_shapes:
-            shape_metrics = calculate_shape_metrics(body_mask)
-            body_stats.update(shape_metrics)
-        
-        characteristics[i] = body_stats
+    characteristics = {i: {"area": pixel_counts[i] * pixel_area} for i in range(1, num_features + 1)}
+    if calculate_shapes:
+        for i, shape_metrics in enumerate(_body_shape_metrics(labeled_mask, num_features), 1):
+            characteristics[i].update(shape_metrics)
     
     return labeled_mask, characteristics
\ No newline at end of file
@@ -4,6 +4,7 @@ Core functionality for the Farq library.
 This module provides fundamental operations for raster data processing including:
 - Raster resampling
 - File I/O operations
+- Block-by-block index calculation for large rasters
 - Band validation
 
 All functions include input validation and detailed error messages.
@@ -12,9 +13,12 @@ All functions include input validation and detailed error messages.
 import numpy as np
 import rasterio
 from rasterio.enums import Resampling
-from typing import Tuple, Union, Optional
+from rasterio.windows import Window
+from typing import Tuple, Union, Optional, Callable, List
+from concurrent.futures import ThreadPoolExecutor
 import os
 from .utils import validate_array
+from .indices import ndwi
 
 def validate_bands(*bands: np.ndarray) -> None:
     """
@@ -45,6 +49,11 @@ def resample(array: np.ndarray, target_shape: Tuple[int, int],
     """
     Resample array to target shape using specified resampling method.
     
+    Nearest neighbour resampling is a direct index lookup with the same
+    pixel-centre alignment as GDAL, and averaging a floating point array by
+    integer factors is a block mean; other methods go through an in-memory
+    rasterio dataset.
+    
     Args:
         array: Input numpy array
         target_shape: Desired output shape as (height, width)
@@ -64,6 +73,27 @@ def resample(array: np.ndarray, target_shape: Tuple[int, int],
     if not all(isinstance(x, int) and x > 0 for x in target_shape):
         raise ValueError("target_shape dimensions must be positive integers")
     
+    if method == Resampling.nearest:
+        # Source pixel containing each target pixel centre
+        rows = ((np.arange(target_shape[0]) + 0.5) * (array.shape[0] / target_shape[0])).astype(np.intp)
+        cols = ((np.arange(target_shape[1]) + 0.5) * (array.shape[1] / target_shape[1])).astype(np.intp)
+        return array[rows[:, None], cols]
+    
+    factors = (array.shape[0] // target_shape[0], array.shape[1] // target_shape[1])
+    if (method == Resampling.average and np.issubdtype(array.dtype, np.floating)
+            and factors[0] * target_shape[0] == array.shape[0]
+            and factors[1] * target_shape[1] == array.shape[1]):
+        # Each target pixel averages a whole block of source pixels. Summing
+        # one strided view per block offset reads the array once and is much
+        # faster than a reduction over the block axes. Sums are in double
+        # precision like GDAL, and NaN propagates as it does in GDAL
+        total = np.zeros(target_shape, dtype=np.float64)
+        for i in range(factors[0]):
+            for j in range(factors[1]):
+                total += array[i::factors[0], j::factors[1]]
+        total /= factors[0] * factors[1]
+        return total.astype(array.dtype)
+    
     # Create temporary rasterio dataset for resampling
     profile = {
         'driver': 'MEM',
@@ -87,17 +117,29 @@ def resample(array: np.ndarray, target_shape: Tuple[int, int],
     
     return resampled
 
-def read(filepath: str) -> Tuple[np.ndarray, dict]:
+def read(filepath: str,
+         dtype: Optional[Union[str, np.dtype]] = np.float32,
+         window: Optional[Union[Window, Tuple[Tuple[int, int], Tuple[int, int]]]] = None) -> Tuple[np.ndarray, dict]:
     """
     Read raster data from file.
     
+    The band is decoded straight into a preallocated array of the requested
+    dtype using GDAL's type conversion, so no intermediate array in the
+    file's data type is allocated and no later cast is needed.
+    
     Args:
         filepath: Path to raster file
+        dtype: Data type of the returned array (default: float32).
+            None keeps the data type of the file
+        window: Optional window to read, as a rasterio Window or
+            ((row_start, row_stop), (col_start, col_stop))
         
     Returns:
         Tuple containing:
             - Numpy array containing raster data
-            - Dictionary of metadata from the raster file
+            - Dictionary of metadata from the raster file (dtype is that of
+              the returned array; height, width and transform describe the
+              window when one is given)
         
     Raises:
         FileNotFoundError: If file does not exist
@@ -109,14 +151,57 @@ def read(filepath: str) -> Tuple[np.ndarray, dict]:
         
     try:
         with rasterio.open(filepath) as src:
-            data = src.read(1)
             metadata = src.meta.copy()
+            if window is None:
+                shape = (src.height, src.width)
+            else:
+                if not isinstance(window, Window):
+                    window = Window.from_slices(*window)
+                shape = (int(window.height), int(window.width))
+                metadata.update(height=shape[0], width=shape[1],
+                                transform=src.window_transform(window))
+            
+            data = np.empty(shape, dtype=src.dtypes[0] if dtype is None else dtype)
+            src.read(1, out=data, window=window)
+            # Writing the array back with this metadata must not truncate it
+            metadata.update(dtype=data.dtype.name)
             return data, metadata
     except rasterio.errors.RasterioIOError as e:
         raise ValueError(f"Unable to read raster file: {e}")
     except Exception as e:
         raise RuntimeError(f"Error reading file {filepath}: {e}")
 
+def read_many(filepaths: List[str],
+              dtype: Optional[Union[str, np.dtype]] = np.float32,
+              max_workers: Optional[int] = None) -> List[Tuple[np.ndarray, dict]]:
+    """
+    Read several raster files concurrently.
+    
+    GDAL releases the GIL while decoding, so reading the files from a thread
+    pool overlaps their decompression instead of decoding one band after
+    another.
+    
+    Args:
+        filepaths: Paths to raster files
+        dtype: Data type of the returned arrays (default: float32).
+            None keeps the data type of each file
+        max_workers: Maximum number of threads (default: one per file)
+        
+    Returns:
+        List of (data, metadata) tuples in the order of `filepaths`
+        
+    Raises:
+        FileNotFoundError: If a file does not exist
+        ValueError: If a file cannot be read as a raster
+        RuntimeError: If there are issues reading a file
+    """
+    filepaths = list(filepaths)
+    if not filepaths:
+        return []
+    
+    with ThreadPoolExecutor(max_workers=max_workers or len(filepaths)) as executor:
+        return list(executor.map(lambda path: read(path, dtype=dtype), filepaths))
+
 def write(filepath: str, data: np.ndarray, metadata: dict) -> None:
     """
     Write raster data to file.
@@ -136,4 +221,65 @@ def write(filepath: str, data: np.ndarray, metadata: dict) -> None:
         with rasterio.open(filepath, 'w', **metadata) as dst:
             dst.write(data, 1)
     except Exception as e:
-        raise RuntimeError(f"Error writing file {filepath}: {e}")
\ No newline at end of file
+        raise RuntimeError(f"Error writing file {filepath}: {e}")
+
+def stream_index(band1_path: str,
+                 band2_path: str,
+                 out_path: str,
+                 index_fn: Callable[..., np.ndarray] = ndwi,
+                 dtype: Union[str, np.dtype] = np.float32,
+                 **kwargs) -> None:
+    """
+    Calculate a two-band spectral index block by block and write it to a GeoTIFF.
+    
+    The rasters are processed one internal block of the first band at a
+    time: both bands are read for the block into reused buffers, the index
+    is calculated and the result is written to the same window of the
+    output. Peak memory is proportional to the block size rather than the
+    scene size, and reads stay aligned with the on-disk tiling.
+    
+    Args:
+        band1_path: Path to the first band (e.g. green for NDWI)
+        band2_path: Path to the second band (e.g. NIR for NDWI)
+        out_path: Path of the output GeoTIFF
+        index_fn: Function calculating the index from the two bands
+            (default: farq.ndwi)
+        dtype: Data type used for reading and writing (default: float32)
+        **kwargs: Additional arguments passed to index_fn
+            (e.g. reflectance_scale)
+        
+    Raises:
+        FileNotFoundError: If an input file does not exist
+        ValueError: If the input rasters have different dimensions
+        
+    Example:
+        >>> farq.stream_index("B3.TIF", "B5.TIF", "ndwi.tif", index_fn=farq.ndwi)
+    """
+    for path in (band1_path, band2_path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"File not found: {path}")
+    
+    with rasterio.open(band1_path) as src1, rasterio.open(band2_path) as src2:
+        if (src1.height, src1.width) != (src2.height, src2.width):
+            raise ValueError(f"Raster dimensions do not match: "
+                             f"{(src1.height, src1.width)} != {(src2.height, src2.width)}")
+        
+        profile = src1.profile.copy()
+        profile.update(driver='GTiff', count=1, dtype=np.dtype(dtype).name, nodata=None)
+        
+        # Scratch buffers sized for the largest block, reused for every window
+        block_height, block_width = src1.block_shapes[0]
+        buffer1 = np.empty(block_height * block_width, dtype=dtype)
+        buffer2 = np.empty(block_height * block_width, dtype=dtype)
+        
+        with rasterio.open(out_path, 'w', **profile) as dst:
+            for _, window in src1.block_windows(1):
+                shape = (int(window.height), int(window.width))
+                size = shape[0] * shape[1]
+                band1 = buffer1[:size].reshape(shape)
+                band2 = buffer2[:size].reshape(shape)
+                src1.read(1, window=window, out=band1)
+                src2.read(1, window=window, out=band2)
+                
+                result = index_fn(band1, band2, **kwargs)
+                dst.write(result.astype(dtype, copy=False), 1, window=window)
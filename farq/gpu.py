@@ -0,0 +1,228 @@
+"""
+GPU implementations of the Farq spectral indices and water body labelling.
+
+This module is optional and requires cupy. The index functions in `farq`
+dispatch to it automatically when given cupy arrays, or it can be used
+directly:
+
+    >>> import farq.gpu
+    >>> ndwi = farq.gpu.ndwi(green, nir)
+
+Bands may be numpy or cupy arrays. Numpy bands are copied to the device in
+their own dtype and converted to the working precision inside the kernels,
+so integer bands are transferred at their native size. Results are returned
+as cupy arrays so that further processing can stay on the device; call
+`.get()` or `cupy.asnumpy` to copy them back. Results follow the same
+conventions as the CPU functions: non-finite values are set to 0 and indices
+are clipped to [-1, 1].
+"""
+from typing import Optional, Tuple, Union, Dict
+
+from . import indices as _indices
+
+try:
+    import cupy as cp
+    from cupyx.scipy import ndimage as cp_ndimage
+    HAS_CUPY = True
+except ImportError:
+    HAS_CUPY = False
+
+if HAS_CUPY:
+    _ND_KERNEL = cp.ElementwiseKernel(
+        'A a, B b', 'T out',
+        '''
+        T x = (T)a;
+        T y = (T)b;
+        T v = (x - y) / (x + y);
+        out = isfinite(v) ? min(max(v, (T)-1), (T)1) : (T)0;
+        ''',
+        'farq_normalized_difference')
+    
+    _SAVI_KERNEL = cp.ElementwiseKernel(
+        'A nir, B red, T L, T scale', 'T out',
+        '''
+        T n = (T)nir / scale;
+        T r = (T)red / scale;
+        T v = (n - r) / (n + r + L) * ((T)1 + L);
+        out = isfinite(v) ? min(max(v, (T)-1), (T)1) : (T)0;
+        ''',
+        'farq_savi')
+    
+    _EVI_KERNEL = cp.ElementwiseKernel(
+        'A red, B nir, C blue, T G, T C1, T C2, T L, T scale', 'T out',
+        '''
+        T r = (T)red / scale;
+        T n = (T)nir / scale;
+        T b = (T)blue / scale;
+        T v = G * (n - r) / (n + C1 * r - C2 * b + L);
+        out = isfinite(v) ? min(max(v, (T)-1), (T)1) : (T)0;
+        ''',
+        'farq_evi')
+
+def _require_cupy() -> None:
+    """Raise an informative error if cupy is not installed."""
+    if not HAS_CUPY:
+        raise ImportError("farq.gpu requires cupy (see https://docs.cupy.dev/en/stable/install.html)")
+
+def _to_device(*bands) -> list:
+    """Validate bands and copy them to the device without changing their dtype."""
+    _require_cupy()
+    arrays = [cp.asarray(band) for band in bands]
+    for i, band in enumerate(arrays):
+        if band.size == 0:
+            raise ValueError(f"Band {i} cannot be empty")
+    shape = arrays[0].shape
+    for band in arrays[1:]:
+        if band.shape != shape:
+            raise ValueError(f"Band shapes do not match: {shape} != {band.shape}")
+    return arrays
+
+def _output(*bands) -> "cp.ndarray":
+    """Allocate a device output array in the working precision."""
+    dtype = _indices._working_dtype(*(band.dtype for band in bands))
+    return cp.empty(bands[0].shape, dtype=dtype)
+
+def normalized_difference(band1, band2) -> "cp.ndarray":
+    """
+    Calculate (band1 - band2) / (band1 + band2) on the GPU.
+    
+    Args:
+        band1: First band (numpy or cupy array)
+        band2: Second band (numpy or cupy array)
+    
+    Returns:
+        cupy array with values in range [-1, 1]
+    
+    Raises:
+        ImportError: If cupy is not installed
+        ValueError: If bands are empty or have different shapes
+    """
+    band1, band2 = _to_device(band1, band2)
+    out = _output(band1, band2)
+    return _ND_KERNEL(band1, band2, out)
+
+def ndwi(green, nir) -> "cp.ndarray":
+    """
+    Calculate NDWI = (NIR - GREEN) / (NIR + GREEN) on the GPU.
+    
+    Uses the same band order and sign convention as `farq.ndwi`.
+    
+    Args:
+        green: Green band array (B3 in Landsat 8)
+        nir: Near-infrared band array (B5 in Landsat 8)
+    
+    Returns:
+        cupy array with values in range [-1, 1]
+    """
+    return normalized_difference(nir, green)
+
+def ndvi(nir, red) -> "cp.ndarray":
+    """
+    Calculate NDVI = (NIR - RED) / (NIR + RED) on the GPU.
+    
+    Args:
+        nir: Near-infrared band (B5)
+        red: Red band (B4)
+    
+    Returns:
+        cupy array with values in range [-1, 1]
+    """
+    return normalized_difference(nir, red)
+
+def savi(nir, red, reflectance_scale: Optional[float] = None, L: float = 0.5) -> "cp.ndarray":
+    """
+    Calculate SAVI = ((NIR - RED) / (NIR + RED + L)) * (1 + L) on the GPU.
+    
+    Args:
+        nir: Near-infrared band (B5)
+        red: Red band (B4)
+        reflectance_scale: Scale factor for reflectance data (10000 for Landsat 8 SR)
+        L: Soil brightness correction factor (default: 0.5)
+    
+    Returns:
+        cupy array with values in range [-1, 1]
+    """
+    if not 0 <= L <= 1:
+        raise ValueError("L must be between 0 and 1")
+    nir, red = _to_device(nir, red)
+    out = _output(nir, red)
+    t = out.dtype.type
+    return _SAVI_KERNEL(nir, red, t(L), t(reflectance_scale or 1.0), out)
+
+def evi(red, nir, blue,
+        reflectance_scale: Optional[float] = None,
+        G: float = 2.5,
+        C1: float = 6.0,
+        C2: float = 7.5,
+        L: float = 1.0) -> "cp.ndarray":
+    """
+    Calculate EVI = G * (NIR - RED) / (NIR + C1 * RED - C2 * BLUE + L) on the GPU.
+    
+    Args:
+        red: Red band (B4)
+        nir: Near-infrared band (B5)
+        blue: Blue band (B2)
+        reflectance_scale: Scale factor for reflectance data (10000 for Landsat 8 SR)
+        G: Gain factor (default: 2.5)
+        C1: Coefficient 1 for atmospheric resistance (default: 6.0)
+        C2: Coefficient 2 for atmospheric resistance (default: 7.5)
+        L: Canopy background adjustment (default: 1.0)
+    
+    Returns:
+        cupy array with values in range [-1, 1]
+    """
+    if L < 0:
+        raise ValueError("L must be non-negative")
+    if G <= 0:
+        raise ValueError("G must be positive")
+    red, nir, blue = _to_device(red, nir, blue)
+    out = _output(red, nir, blue)
+    t = out.dtype.type
+    return _EVI_KERNEL(red, nir, blue, t(G), t(C1), t(C2), t(L), t(reflectance_scale or 1.0), out)
+
+def get_water_bodies(water_mask,
+                     pixel_size: Union[float, Tuple[float, float]] = 30.0,
+                     min_area: Optional[float] = None) -> Tuple["cp.ndarray", Dict[int, Dict]]:
+    """
+    Label individual water bodies on the GPU and calculate their areas.
+    
+    Labels match `farq.get_water_bodies` (4-connectivity, numbered in raster
+    order). Shape metrics are not calculated on the GPU.
+    
+    Args:
+        water_mask: Binary water mask (numpy or cupy array)
+        pixel_size: Pixel size in meters
+            Can be a single float for square pixels or a tuple (width, height)
+        min_area: Minimum water body area in square meters (optional)
+    
+    Returns:
+        Tuple containing:
+            - Labeled cupy array where each water body has a unique integer ID
+            - Dictionary mapping water body IDs to {"area": area in km²}
+    """
+    mask, = _to_device(water_mask)
+    if isinstance(pixel_size, tuple):
+        if len(pixel_size) != 2 or any(p <= 0 for p in pixel_size):
+            raise ValueError("pixel_size tuple must have exactly 2 positive elements")
+        pixel_area = (pixel_size[0] * pixel_size[1]) / 1_000_000  # Convert to km²
+    else:
+        if pixel_size <= 0:
+            raise ValueError("Pixel size must be positive")
+        pixel_area = (pixel_size * pixel_size) / 1_000_000  # Convert to km²
+    
+    labeled_mask, num_features = cp_ndimage.label(mask.astype(bool, copy=False))
+    pixel_counts = cp.bincount(labeled_mask.ravel(), minlength=num_features + 1)
+    
+    if min_area is not None:
+        min_pixels = min_area / (pixel_area * 1_000_000)
+        valid_labels = cp.flatnonzero(pixel_counts[1:] >= min_pixels) + 1
+        label_map = cp.zeros(num_features + 1, dtype=labeled_mask.dtype)
+        label_map[valid_labels] = cp.arange(1, len(valid_labels) + 1, dtype=labeled_mask.dtype)
+        labeled_mask = label_map[labeled_mask]
+        pixel_counts = cp.concatenate((cp.zeros(1, dtype=pixel_counts.dtype), pixel_counts[valid_labels]))
+        num_features = len(valid_labels)
+    
+    # Only the per-body counts are copied back to the host
+    counts = cp.asnumpy(pixel_counts)
+    characteristics = {i: {"area": counts[i] * pixel_area} for i in range(1, num_features + 1)}
+    return labeled_mask, characteristics
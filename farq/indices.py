@@ -9,10 +9,78 @@ This module provides functions for calculating various spectral indices:
 - NDBI (Normalized Difference Built-up Index)
 - NBR (Normalized Burn Ratio)
 - NDMI (Normalized Difference Moisture Index)
+- NDSI (Normalized Difference Snow Index)
+
+All normalized difference indices are thin wrappers around
+`calculate_normalized_difference`, so they share a single fused kernel.
+Bands given as cupy arrays are calculated on the GPU by `farq.gpu`, and
+dask arrays are calculated lazily, block by block.
 """
 
 import numpy as np
 from typing import Optional, Dict, Union, List, Tuple
+from . import _kernels
+
+# Minimum floating point precision used for index calculations
+_PRECISION = np.dtype(np.float32)
+
+def set_precision(dtype: Union[str, type, np.dtype]) -> None:
+    """
+    Set the minimum floating point precision used for index calculations.
+    
+    Integer bands (e.g. uint16 Landsat 8 SR) are converted to this precision
+    before calculation; float64 bands always keep float64. The default of
+    float32 halves memory use and bandwidth compared to float64 while giving
+    ample precision for reflectance values and indices in [-1, 1].
+    
+    Args:
+        dtype: 'float32' or 'float64' (or the corresponding numpy type)
+        
+    Raises:
+        ValueError: If dtype is not float32 or float64
+    """
+    global _PRECISION
+    dtype = np.dtype(dtype)
+    if dtype not in (np.dtype(np.float32), np.dtype(np.float64)):
+        raise ValueError(f"Precision must be float32 or float64, got {dtype}")
+    _PRECISION = dtype
+
+def _working_dtype(*bands: np.ndarray) -> np.dtype:
+    """Floating point dtype used to calculate an index from the given bands."""
+    return np.result_type(*bands, _PRECISION)
+
+def _is_cupy(*bands) -> bool:
+    """Whether any band is a cupy array (checked without importing cupy)."""
+    return any(type(band).__module__.split('.')[0] == 'cupy' for band in bands)
+
+def _is_dask(*bands) -> bool:
+    """Whether any band is a dask array (checked without importing dask)."""
+    return any(type(band).__module__.split('.')[0] == 'dask' for band in bands)
+
+def _map_blocks(func, *bands, **kwargs):
+    """
+    Apply an index function to each block of dask array bands.
+    
+    All bands are rechunked to the chunks of the first dask band so that
+    blocks line up. Each block is an independent in-memory call of `func`.
+    """
+    import dask.array as da
+    chunks = next(band.chunks for band in bands if _is_dask(band))
+    bands = [da.asarray(band).rechunk(chunks) for band in bands]
+    dtype = _working_dtype(*(band.dtype for band in bands))
+    return da.map_blocks(func, *bands, dtype=dtype, **kwargs)
+
+def _output(out: Optional[np.ndarray], *bands: np.ndarray) -> np.ndarray:
+    """Return `out` after checking it can hold the index, or allocate a new array."""
+    if out is None:
+        return np.empty(bands[0].shape, dtype=_working_dtype(*bands))
+    if not isinstance(out, np.ndarray):
+        raise TypeError("out must be a numpy array")
+    if out.shape != bands[0].shape:
+        raise ValueError(f"Output shape does not match bands: {out.shape} != {bands[0].shape}")
+    if out.dtype.kind != 'f' or not out.flags.c_contiguous or not out.flags.writeable:
+        raise ValueError("out must be a writeable C-contiguous floating point array")
+    return out
 
 def validate_bands(*bands: np.ndarray, reflectance_scale: Optional[float] = None) -> List[np.ndarray]:
     """
@@ -23,68 +91,108 @@ def validate_bands(*bands: np.ndarray, reflectance_scale: Optional[float] = None
         reflectance_scale: Optional scale factor for reflectance data (e.g., 10000 for Landsat 8 SR)
         
     Returns:
-        List of validated and optionally scaled band arrays
+        List of validated band arrays. Bands are returned as-is unless a
+        reflectance scale is given, in which case scaled copies in the
+        working precision (see `set_precision`) are returned.
         
     Raises:
-        TypeError: If any band is not a numpy array
+        TypeError: If any band is not a numpy (or cupy or dask) array
         ValueError: If bands have different shapes or are empty
     """
     if not bands:
         raise ValueError("No bands provided")
     
-    validated_bands = []
-    
     # Check each band
     for i, band in enumerate(bands):
-        if not isinstance(band, np.ndarray):
+        if not isinstance(band, np.ndarray) and not _is_cupy(band) and not _is_dask(band):
             raise TypeError(f"Band {i} must be a numpy array")
         if band.size == 0:
             raise ValueError(f"Band {i} cannot be empty")
-            
-        # Make a copy and apply scaling if needed
-        band_data = band.copy()
-        if reflectance_scale is not None:
-            band_data = band_data / reflectance_scale
-            
-        validated_bands.append(band_data)
     
     # Check shapes match
-    shape = validated_bands[0].shape
-    for i, band in enumerate(validated_bands[1:], 1):
+    shape = bands[0].shape
+    for i, band in enumerate(bands[1:], 1):
         if band.shape != shape:
             raise ValueError(f"Band shapes do not match: {shape} != {band.shape}")
-            
-    return validated_bands
+    
+    if reflectance_scale is None:
+        return list(bands)
+    
+    dtype = _working_dtype(*(band.dtype for band in bands))
+    return [np.divide(band, reflectance_scale, dtype=dtype) for band in bands]
 
 def calculate_normalized_difference(band1: np.ndarray, 
                                  band2: np.ndarray, 
-                                 clip: bool = True) -> np.ndarray:
+                                 clip: bool = True,
+                                 out: Optional[np.ndarray] = None) -> np.ndarray:
     """
     Calculate normalized difference between two bands.
     
+    The difference, division and clipping are fused into a single pass over
+    the bands (see `farq._kernels`), so no full-size temporaries are created.
+    
     Args:
         band1: First band array
         band2: Second band array
         clip: Whether to clip values to [-1, 1] range
+        out: Optional preallocated output array to write the result into
+            (floating point, C-contiguous, same shape as the bands). The
+            index is calculated in the dtype of `out`.
         
     Returns:
-        Normalized difference array
-    """
-    with np.errstate(divide='ignore', invalid='ignore'):
-        nd = (band1 - band2) / (band1 + band2)
+        Normalized difference array (`out` if given)
         
-    # Handle division by zero and invalid values
-    nd = np.nan_to_num(nd, nan=0.0, posinf=0.0, neginf=0.0)
+    Raises:
+        ValueError: If bands have different shapes or `out` is not suitable
+    """
+    if band1.shape != band2.shape:
+        raise ValueError(f"Band shapes do not match: {band1.shape} != {band2.shape}")
+    
+    if _is_dask(band1, band2):
+        if out is not None:
+            raise ValueError("out is not supported for dask arrays")
+        return _map_blocks(calculate_normalized_difference, band1, band2, clip=clip)
+    
+    if _is_cupy(band1, band2):
+        if not clip or out is not None:
+            raise ValueError("clip=False and out are not supported for cupy arrays")
+        from . import gpu
+        return gpu.normalized_difference(band1, band2)
+    
+    nd = _output(out, band1, band2)
+    return _kernels.normalized_difference(band1, band2, nd, clip=clip)
+
+def calculate_normalized_difference_q8(band1: np.ndarray,
+                                    band2: np.ndarray) -> np.ndarray:
+    """
+    Calculate normalized difference between two bands quantized to int8.
+    
+    The clipped index is stored as round(value * 127) in the same pass that
+    calculates it, so the result takes a quarter of the memory of float32.
+    Small non-zero values are kept at +/-1 rather than rounded to 0, so
+    thresholding at 0 gives exactly the same mask as the float result. Pass
+    reflectance_scale=127 to `stats` or `hist` to work in index units.
     
-    # Clip values if requested
-    if clip:
-        np.clip(nd, -1.0, 1.0, out=nd)
+    Args:
+        band1: First band array
+        band2: Second band array
         
-    return nd
+    Returns:
+        int8 array with values in range [-127, 127]
+        
+    Raises:
+        ValueError: If bands have different shapes
+    """
+    if band1.shape != band2.shape:
+        raise ValueError(f"Band shapes do not match: {band1.shape} != {band2.shape}")
+    
+    nd = np.empty(band1.shape, dtype=np.int8)
+    return _kernels.normalized_difference_q8(band1, band2, nd, _working_dtype(band1, band2))
 
 def ndvi(nir: np.ndarray, 
          red: np.ndarray, 
-         reflectance_scale: Optional[float] = None) -> np.ndarray:
+         reflectance_scale: Optional[float] = None,
+         out: Optional[np.ndarray] = None) -> np.ndarray:
     """
     Calculate Normalized Difference Vegetation Index (NDVI) for Landsat 8.
     
@@ -94,13 +202,15 @@ def ndvi(nir: np.ndarray,
         nir: Near-infrared band (B5)
         red: Red band (B4)
         reflectance_scale: Scale factor for reflectance data (10000 for Landsat 8 SR)
+        out: Optional preallocated output array (see `calculate_normalized_difference`)
         
     Returns:
         NDVI array with values in range [-1, 1]
         Higher values (>0.2) indicate vegetation
     """
-    nir, red = validate_bands(nir, red, reflectance_scale=reflectance_scale)
-    return calculate_normalized_difference(nir, red)
+    # The ratio does not depend on the reflectance scale, so the bands are not rescaled
+    nir, red = validate_bands(nir, red)
+    return calculate_normalized_difference(nir, red, out=out)
 
 def evi(red: np.ndarray, 
         nir: np.ndarray, 
@@ -109,7 +219,8 @@ def evi(red: np.ndarray,
         G: float = 2.5, 
         C1: float = 6.0, 
         C2: float = 7.5, 
-        L: float = 1.0) -> np.ndarray:
+        L: float = 1.0,
+        out: Optional[np.ndarray] = None) -> np.ndarray:
     """
     Calculate Enhanced Vegetation Index (EVI) for Landsat 8.
     
@@ -124,8 +235,10 @@ def evi(red: np.ndarray,
         C1: Coefficient 1 for atmospheric resistance (default: 6.0)
         C2: Coefficient 2 for atmospheric resistance (default: 7.5)
         L: Canopy background adjustment (default: 1.0)
+        out: Optional preallocated output array (see `calculate_normalized_difference`)
     """
-    red, nir, blue = validate_bands(red, nir, blue, reflectance_scale=reflectance_scale)
+    # Reflectance scaling is applied per pixel inside the kernel
+    red, nir, blue = validate_bands(red, nir, blue)
     
     # Parameter validation
     if not all(isinstance(x, (int, float)) for x in [G, C1, C2, L]):
@@ -135,23 +248,28 @@ def evi(red: np.ndarray,
     if G <= 0:
         raise ValueError("G must be positive")
     
-    # Calculate EVI with proper error handling
-    with np.errstate(divide='ignore', invalid='ignore'):
-        denominator = nir + C1 * red - C2 * blue + L
-        evi = G * (nir - red) / denominator
-        
-    # Handle division by zero and invalid values
-    evi = np.nan_to_num(evi, nan=0.0, posinf=0.0, neginf=0.0)
-    
-    # Clip to reasonable range
-    np.clip(evi, -1.0, 1.0, out=evi)
-    
-    return evi
+    if _is_dask(red, nir, blue):
+        if out is not None:
+            raise ValueError("out is not supported for dask arrays")
+        return _map_blocks(evi, red, nir, blue, reflectance_scale=reflectance_scale,
+                           G=G, C1=C1, C2=C2, L=L)
+    
+    if _is_cupy(red, nir, blue):
+        if out is not None:
+            raise ValueError("out is not supported for cupy arrays")
+        from . import gpu
+        return gpu.evi(red, nir, blue, reflectance_scale, G=G, C1=C1, C2=C2, L=L)
+    
+    # Calculate EVI, mapping division by zero and invalid values to 0
+    out = _output(out, red, nir, blue)
+    return _kernels.evi(red, nir, blue, out, G=G, C1=C1, C2=C2, L=L,
+                        scale=1.0 if reflectance_scale is None else reflectance_scale)
 
 def savi(nir: np.ndarray, 
          red: np.ndarray, 
          reflectance_scale: Optional[float] = None,
-         L: float = 0.5) -> np.ndarray:
+         L: float = 0.5,
+         out: Optional[np.ndarray] = None) -> np.ndarray:
     """
     Calculate Soil Adjusted Vegetation Index (SAVI) for Landsat 8.
     
@@ -162,8 +280,10 @@ def savi(nir: np.ndarray,
         red: Red band (B4)
         reflectance_scale: Scale factor for reflectance data (10000 for Landsat 8 SR)
         L: Soil brightness correction factor (default: 0.5)
+        out: Optional preallocated output array (see `calculate_normalized_difference`)
     """
-    nir, red = validate_bands(nir, red, reflectance_scale=reflectance_scale)
+    # Reflectance scaling is applied per pixel inside the kernel
+    nir, red = validate_bands(nir, red)
     
     # Parameter validation
     if not isinstance(L, (int, float)):
@@ -171,21 +291,26 @@ def savi(nir: np.ndarray,
     if not 0 <= L <= 1:
         raise ValueError("L must be between 0 and 1")
     
-    # Calculate SAVI with proper error handling
-    with np.errstate(divide='ignore', invalid='ignore'):
-        savi = ((nir - red) / (nir + red + L)) * (1 + L)
-        
-    # Handle division by zero and invalid values
-    savi = np.nan_to_num(savi, nan=0.0, posinf=0.0, neginf=0.0)
-    
-    # Ensure output is in [-1, 1] range
-    np.clip(savi, -1.0, 1.0, out=savi)
-    
-    return savi
+    if _is_dask(nir, red):
+        if out is not None:
+            raise ValueError("out is not supported for dask arrays")
+        return _map_blocks(savi, nir, red, reflectance_scale=reflectance_scale, L=L)
+    
+    if _is_cupy(nir, red):
+        if out is not None:
+            raise ValueError("out is not supported for cupy arrays")
+        from . import gpu
+        return gpu.savi(nir, red, reflectance_scale, L=L)
+    
+    # Calculate SAVI, mapping division by zero and invalid values to 0
+    out = _output(out, nir, red)
+    return _kernels.savi(nir, red, out, L=L,
+                         scale=1.0 if reflectance_scale is None else reflectance_scale)
 
 def ndwi(green: np.ndarray, 
          nir: np.ndarray, 
-         reflectance_scale: Optional[float] = None) -> np.ndarray:
+         reflectance_scale: Optional[float] = None,
+         out: Optional[np.ndarray] = None) -> np.ndarray:
     """
     Calculate Normalized Difference Water Index (NDWI).
     
@@ -197,16 +322,50 @@ def ndwi(green: np.ndarray,
         green: Green band array (B3 in Landsat 8)
         nir: Near-infrared band array (B5 in Landsat 8)
         reflectance_scale: Scale factor for reflectance data (e.g., 10000 for Landsat 8 SR)
+        out: Optional preallocated output array (see `calculate_normalized_difference`)
         
     Returns:
         NDWI array with values in range [-1, 1]
     """
-    green, nir = validate_bands(green, nir, reflectance_scale=reflectance_scale)
-    return calculate_normalized_difference(nir, green)  # Flipped order for Landsat 8
+    # The ratio does not depend on the reflectance scale, so the bands are not rescaled
+    green, nir = validate_bands(green, nir)
+    return calculate_normalized_difference(nir, green, out=out)  # Flipped order for Landsat 8
+
+def ndwi_q8(green: np.ndarray, nir: np.ndarray) -> np.ndarray:
+    """
+    Calculate NDWI quantized to int8 (NDWI * 127, rounded).
+    
+    Uses the same band order as `ndwi`. Reflectance scaling is not needed
+    because the index does not depend on it.
+    
+    Args:
+        green: Green band array (B3 in Landsat 8)
+        nir: Near-infrared band array (B5 in Landsat 8)
+        
+    Returns:
+        int8 NDWI array with values in range [-127, 127]
+    """
+    green, nir = validate_bands(green, nir)
+    return calculate_normalized_difference_q8(nir, green)
+
+def ndvi_q8(nir: np.ndarray, red: np.ndarray) -> np.ndarray:
+    """
+    Calculate NDVI quantized to int8 (NDVI * 127, rounded).
+    
+    Args:
+        nir: Near-infrared band (B5)
+        red: Red band (B4)
+        
+    Returns:
+        int8 NDVI array with values in range [-127, 127]
+    """
+    nir, red = validate_bands(nir, red)
+    return calculate_normalized_difference_q8(nir, red)
 
 def ndbi(swir1: np.ndarray, 
          nir: np.ndarray, 
-         reflectance_scale: Optional[float] = None) -> np.ndarray:
+         reflectance_scale: Optional[float] = None,
+         out: Optional[np.ndarray] = None) -> np.ndarray:
     """
     Calculate Normalized Difference Built-up Index (NDBI) for Landsat 8.
     
@@ -216,17 +375,20 @@ def ndbi(swir1: np.ndarray,
         swir1: Short-wave infrared band 1 (B6)
         nir: Near-infrared band (B5)
         reflectance_scale: Scale factor for reflectance data (10000 for Landsat 8 SR)
+        out: Optional preallocated output array (see `calculate_normalized_difference`)
         
     Returns:
         NDBI array with values in range [-1, 1]
         Higher values indicate built-up areas
     """
-    swir1, nir = validate_bands(swir1, nir, reflectance_scale=reflectance_scale)
-    return calculate_normalized_difference(swir1, nir)
+    # The ratio does not depend on the reflectance scale, so the bands are not rescaled
+    swir1, nir = validate_bands(swir1, nir)
+    return calculate_normalized_difference(swir1, nir, out=out)
 
 def nbr(nir: np.ndarray, 
         swir2: np.ndarray, 
-        reflectance_scale: Optional[float] = None) -> np.ndarray:
+        reflectance_scale: Optional[float] = None,
+        out: Optional[np.ndarray] = None) -> np.ndarray:
     """
     Calculate Normalized Burn Ratio (NBR) for Landsat 8.
     
@@ -236,17 +398,20 @@ def nbr(nir: np.ndarray,
         nir: Near-infrared band (B5)
         swir2: Short-wave infrared band 2 (B7)
         reflectance_scale: Scale factor for reflectance data (10000 for Landsat 8 SR)
+        out: Optional preallocated output array (see `calculate_normalized_difference`)
         
     Returns:
         NBR array with values in range [-1, 1]
         Lower values indicate burned areas
     """
-    nir, swir2 = validate_bands(nir, swir2, reflectance_scale=reflectance_scale)
-    return calculate_normalized_difference(nir, swir2)
+    # The ratio does not depend on the reflectance scale, so the bands are not rescaled
+    nir, swir2 = validate_bands(nir, swir2)
+    return calculate_normalized_difference(nir, swir2, out=out)
 
 def ndmi(nir: np.ndarray, 
          swir1: np.ndarray, 
-         reflectance_scale: Optional[float] = None) -> np.ndarray:
+         reflectance_scale: Optional[float] = None,
+         out: Optional[np.ndarray] = None) -> np.ndarray:
     """
     Calculate Normalized Difference Moisture Index (NDMI) for Landsat 8.
     
@@ -256,13 +421,38 @@ def ndmi(nir: np.ndarray,
         nir: Near-infrared band (B5)
         swir1: Short-wave infrared band 1 (B6)
         reflectance_scale: Scale factor for reflectance data (10000 for Landsat 8 SR)
+        out: Optional preallocated output array (see `calculate_normalized_difference`)
         
     Returns:
         NDMI array with values in range [-1, 1]
         Higher values indicate higher moisture content
     """
-    nir, swir1 = validate_bands(nir, swir1, reflectance_scale=reflectance_scale)
-    return calculate_normalized_difference(nir, swir1)
+    # The ratio does not depend on the reflectance scale, so the bands are not rescaled
+    nir, swir1 = validate_bands(nir, swir1)
+    return calculate_normalized_difference(nir, swir1, out=out)
+
+def ndsi(green: np.ndarray, 
+         swir1: np.ndarray, 
+         reflectance_scale: Optional[float] = None,
+         out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Calculate Normalized Difference Snow Index (NDSI) for Landsat 8.
+    
+    NDSI = (GREEN - SWIR1) / (GREEN + SWIR1)
+    
+    Args:
+        green: Green band (B3)
+        swir1: Short-wave infrared band 1 (B6)
+        reflectance_scale: Scale factor for reflectance data (10000 for Landsat 8 SR)
+        out: Optional preallocated output array (see `calculate_normalized_difference`)
+        
+    Returns:
+        NDSI array with values in range [-1, 1]
+        Higher values (>0.4) indicate snow and ice
+    """
+    # The ratio does not depend on the reflectance scale, so the bands are not rescaled
+    green, swir1 = validate_bands(green, swir1)
+    return calculate_normalized_difference(green, swir1, out=out)
 
 def calculate_indices(bands: Dict[str, np.ndarray], 
                      indices: List[str],
@@ -270,6 +460,10 @@ def calculate_indices(bands: Dict[str, np.ndarray],
     """
     Calculate multiple spectral indices at once.
     
+    When two or more of NDVI, SAVI and EVI are requested they are computed
+    together in a single pass over the bands, using the default SAVI and
+    EVI coefficients.
+    
     Args:
         bands: Dictionary of band arrays with keys like 'red', 'nir', 'swir1', etc.
         indices: List of index names to calculate ('ndvi', 'ndwi', etc.)
@@ -291,11 +485,10 @@ def calculate_indices(bands: Dict[str, np.ndarray],
         'savi': (('nir', 'red'), savi),
         'ndbi': (('swir1', 'nir'), ndbi),
         'nbr': (('nir', 'swir2'), nbr),
-        'ndmi': (('nir', 'swir1'), ndmi)
+        'ndmi': (('nir', 'swir1'), ndmi),
+        'ndsi': (('green', 'swir1'), ndsi)
     }
     
-    result = {}
-    
     for index_name in indices:
         if index_name not in available_indices:
             raise ValueError(f"Unknown index: {index_name}")
@@ -306,9 +499,48 @@ def calculate_indices(bands: Dict[str, np.ndarray],
         missing_bands = [band for band in required_bands if band not in bands]
         if missing_bands:
             raise ValueError(f"Missing required bands for {index_name}: {missing_bands}")
-        
-        # Calculate the index
-        band_arrays = [bands[band] for band in required_bands]
-        result[index_name] = func(*band_arrays, reflectance_scale=reflectance_scale)
     
+    # NDVI, SAVI and EVI share their bands, so they are computed in one pass
+    result = _vegetation_indices(bands, indices, reflectance_scale)
+    
+    for index_name in indices:
+        if index_name not in result:
+            required_bands, func = available_indices[index_name]
+            band_arrays = [bands[band] for band in required_bands]
+            result[index_name] = func(*band_arrays, reflectance_scale=reflectance_scale)
+    
+    return {index_name: result[index_name] for index_name in indices}
+
+def _vegetation_indices(bands: Dict[str, np.ndarray],
+                        indices: List[str],
+                        reflectance_scale: Optional[float]) -> Dict[str, np.ndarray]:
+    """
+    Calculate the requested NDVI, SAVI and EVI with one fused kernel.
+    
+    Returns an empty dictionary when fewer than two of them are requested
+    or the bands need a different code path (GPU, dask or mixed precision),
+    in which case they are calculated individually.
+    """
+    names = [name for name in ('ndvi', 'savi', 'evi') if name in indices]
+    if len(names) < 2:
+        return {}
+    band_names = ('nir', 'red', 'blue') if 'evi' in names else ('nir', 'red')
+    arrays = [bands[name] for name in band_names]
+    if not all(isinstance(band, np.ndarray) for band in arrays):
+        return {}
+    # Every index must come out in the precision it has on its own
+    dtype = _working_dtype(*(band.dtype for band in arrays))
+    if dtype != _working_dtype(arrays[0].dtype, arrays[1].dtype):
+        return {}
+    
+    validate_bands(*arrays)
+    
+    # Coefficients are the defaults of `savi` and `evi`
+    result = {name: np.empty(arrays[0].shape, dtype=dtype) for name in names}
+    # Blue is only read, and validated, when EVI is requested
+    blue = arrays[2] if 'evi' in names else None
+    _kernels.vegetation_indices(arrays[0], arrays[1], blue,
+                                result.get('ndvi'), result.get('savi'), result.get('evi'),
+                                L_savi=0.5, G=2.5, C1=6.0, C2=7.5, L_evi=1.0,
+                                scale=1.0 if reflectance_scale is None else reflectance_scale)
     return result 
\ No newline at end of file
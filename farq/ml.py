@@ -22,6 +22,7 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.cluster import KMeans, DBSCAN
 import joblib
 from pathlib import Path
+from .analysis import _body_masks
 
 def extract_features(raster_data: np.ndarray,
                     indices: Optional[List[str]] = None,
@@ -230,7 +231,7 @@ def detect_changes_ml(raster1: np.ndarray,
         # Simple threshold-based detection
         changes = diff > threshold
     
-    return changes.astype(bool)
+    return changes.astype(bool, copy=False)
 
 def augment_training_data(features: np.ndarray,
                          labels: np.ndarray,
@@ -338,7 +339,7 @@ def cluster_water_bodies(raster_data: np.ndarray,
             
         metadata = {
             'n_clusters': len(np.unique(labels[labels >= 0])),
-            'noise_points': np.sum(labels == -1),
+            'noise_points': np.count_nonzero(labels == -1),
             'water_cluster': water_cluster
         }
         
@@ -383,11 +384,9 @@ def analyze_water_clusters(cluster_labels: np.ndarray,
     perimeters = []
     compactness = []
     
-    for i in range(1, num_features + 1):
-        body = labeled_water == i
-        
+    for body in _body_masks(labeled_water, num_features):
         # Area
-        area = np.sum(body) * pixel_area
+        area = np.count_nonzero(body) * pixel_area
         areas.append(area)
         
         # Perimeter
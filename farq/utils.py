@@ -3,9 +3,18 @@ Utility functions for array operations.
 
 This module provides basic array operations with enhanced error handling and input validation.
 All functions handle NaN values gracefully and provide clear error messages.
+`nanmin`, `nanmax` and `nansum` are also available as `min`, `max` and `sum`
+for backwards compatibility; these aliases are left out of `__all__` so that
+star imports do not shadow the builtins.
 """
 import numpy as np
 from typing import Union, Tuple, Optional, Dict
+from . import _kernels
+
+__all__ = [
+    'validate_array', 'stats', 'nansum', 'mean', 'std', 'nanmin', 'nanmax',
+    'median', 'percentile', 'count_nonzero', 'unique',
+]
 
 def validate_array(array: np.ndarray, name: str = "array") -> None:
     """
@@ -23,7 +32,9 @@ def validate_array(array: np.ndarray, name: str = "array") -> None:
         raise TypeError(f"{name} must be a numpy array, got {type(array)}")
     if array.size == 0:
         raise ValueError(f"{name} cannot be empty")
-    if np.all(np.isnan(array)):
+    # Only floating point arrays can hold NaN, and any non-NaN first value
+    # settles the check without scanning (and copying) the whole array
+    if array.dtype.kind in 'fc' and np.isnan(array.flat[0]) and np.isnan(array).all():
         raise ValueError(f"{name} cannot contain all NaN values")
 
 def stats(data: np.ndarray, 
@@ -68,54 +79,82 @@ def stats(data: np.ndarray,
     """
     validate_array(data)
     
-    # Make a copy to avoid modifying the original
-    arr = data.copy()
+    # Pass 1: counts, finite sum, min and max
+    n_valid, n_nan, n_posinf, n_neginf, n_zero, total, finite_min, finite_max = _kernels.summary(data)
+    
+    # NaN-ignoring min/max/mean, matching np.nanmin/np.nanmax/np.nanmean
+    minimum = -np.inf if n_neginf else (finite_min if n_valid else np.inf)
+    maximum = np.inf if n_posinf else (finite_max if n_valid else -np.inf)
+    if n_posinf and n_neginf:
+        mean = np.nan
+    elif n_posinf or n_neginf:
+        mean = np.inf if n_posinf else -np.inf
+    else:
+        mean = total / n_valid
+    finite_mean = total / n_valid if n_valid else 0.0
+    
+    # Pass 2: central moments and histogram of the finite values
+    if n_valid:
+        edges = np.histogram_bin_edges(np.empty(0, dtype=data.dtype), bins=bins,
+                                       range=(finite_min, finite_max))
+    else:
+        edges = np.histogram_bin_edges(np.empty(0, dtype=data.dtype), bins=bins)
+    m2, m3, m4, counts = _kernels.moments(data, finite_mean, edges)
+    variance = m2 / n_valid if n_valid and not (n_posinf or n_neginf) else np.nan
+    
+    # All percentiles, including the median, from one partition
+    q = list(percentiles) + [50]
+    percentile_fn = np.nanpercentile if n_nan else np.percentile
+    values = percentile_fn(data, q)
+    median = float(values[-1])
     
     # Basic statistics
     stats_dict = {
-        'min': float(np.nanmin(arr)),
-        'max': float(np.nanmax(arr)),
-        'mean': float(np.nanmean(arr)),
-        'std': float(np.nanstd(arr)),
-        'median': float(np.nanmedian(arr)),
-        'percentiles': {str(p): float(np.nanpercentile(arr, p)) for p in percentiles},
-        'non_zero': int(np.count_nonzero(~np.isnan(arr))),
-        'zeros': int(np.sum(arr == 0)),
-        'nan': int(np.sum(np.isnan(arr))),
-        'inf': int(np.sum(np.isinf(arr))),
-        'valid': int(np.sum(~np.isnan(arr) & ~np.isinf(arr))),
-        'shape': arr.shape,
-        'size': int(arr.size),
-        'dtype': str(arr.dtype),
-        'range': float(np.nanmax(arr) - np.nanmin(arr)),
-        'variance': float(np.nanvar(arr))
+        'min': float(minimum),
+        'max': float(maximum),
+        'mean': float(mean),
+        'std': float(np.sqrt(variance)),
+        'median': median,
+        'percentiles': {str(p): float(v) for p, v in zip(percentiles, values)},
+        'non_zero': int(data.size - n_nan),
+        'zeros': n_zero,
+        'nan': n_nan,
+        'inf': n_posinf + n_neginf,
+        'valid': n_valid,
+        'shape': data.shape,
+        'size': int(data.size),
+        'dtype': str(data.dtype),
+        'range': float(maximum - minimum),
+        'variance': float(variance),
+        'histogram': {'counts': counts, 'bin_edges': edges}
     }
     
-    # Add skewness and kurtosis if scipy is available
-    try:
-        from scipy import stats as sp_stats
-        valid_data = arr[~np.isnan(arr) & ~np.isinf(arr)]
-        if len(valid_data) > 0:
-            stats_dict['skewness'] = float(sp_stats.skew(valid_data))
-            stats_dict['kurtosis'] = float(sp_stats.kurtosis(valid_data))
-    except ImportError:
-        pass
+    # Skewness and kurtosis of the finite values (biased estimators, as
+    # scipy.stats.skew and scipy.stats.kurtosis)
+    if n_valid > 0:
+        m2, m3, m4 = m2 / n_valid, m3 / n_valid, m4 / n_valid
+        if m2 <= (np.finfo(np.float64).resolution * finite_mean) ** 2:
+            stats_dict['skewness'] = np.nan
+            stats_dict['kurtosis'] = np.nan
+        else:
+            stats_dict['skewness'] = float(m3 / m2 ** 1.5)
+            stats_dict['kurtosis'] = float(m4 / m2 ** 2 - 3.0)
     
     # Add reflectance statistics if scale is provided
     if reflectance_scale is not None:
-        scaled_arr = arr / reflectance_scale
+        scaled_min, scaled_max = sorted((minimum / reflectance_scale, maximum / reflectance_scale))
         stats_dict['reflectance_stats'] = {
-            'min': float(np.nanmin(scaled_arr)),
-            'max': float(np.nanmax(scaled_arr)),
-            'mean': float(np.nanmean(scaled_arr)),
-            'std': float(np.nanstd(scaled_arr)),
-            'median': float(np.nanmedian(scaled_arr)),
-            'percentiles': {str(p): float(np.nanpercentile(scaled_arr, p)) 
-                          for p in percentiles}
+            'min': float(scaled_min),
+            'max': float(scaled_max),
+            'mean': float(mean / reflectance_scale),
+            'std': float(stats_dict['std'] / abs(reflectance_scale)),
+            'median': median / reflectance_scale,
+            'percentiles': {p: v / reflectance_scale 
+                          for p, v in stats_dict['percentiles'].items()}
         }
     
     # Add percentage statistics
-    total_pixels = arr.size
+    total_pixels = data.size
     stats_dict['percentages'] = {
         'valid': 100 * stats_dict['valid'] / total_pixels,
         'nan': 100 * stats_dict['nan'] / total_pixels,
@@ -125,7 +164,7 @@ def stats(data: np.ndarray,
     
     return stats_dict
 
-def sum(data: np.ndarray, axis: Optional[int] = None) -> Union[float, np.ndarray]:
+def nansum(data: np.ndarray, axis: Optional[int] = None) -> Union[float, np.ndarray]:
     """
     Calculate the sum of array elements, ignoring NaN values.
     
@@ -159,7 +198,10 @@ def mean(data: np.ndarray, axis: Optional[int] = None) -> Union[float, np.ndarra
         ValueError: If array is empty or contains all NaN values
     """
     validate_array(data)
-    result = np.nanmean(data, axis=axis)
+    if axis is None:
+        result = _kernels.mean(data)
+    else:
+        result = np.nanmean(data, axis=axis)
     if np.isnan(result).any():
         raise ValueError("No valid values found in array (all NaN)")
     return result
@@ -180,12 +222,15 @@ def std(data: np.ndarray, axis: Optional[int] = None) -> Union[float, np.ndarray
         ValueError: If array is empty or contains all NaN values
     """
     validate_array(data)
-    result = np.nanstd(data, axis=axis)
+    if axis is None:
+        result = _kernels.mean_std(data)[1]
+    else:
+        result = np.nanstd(data, axis=axis)
     if np.isnan(result).any():
         raise ValueError("No valid values found in array (all NaN)")
     return result
 
-def min(data: np.ndarray, axis: Optional[int] = None) -> Union[float, np.ndarray]:
+def nanmin(data: np.ndarray, axis: Optional[int] = None) -> Union[float, np.ndarray]:
     """
     Calculate the minimum of array elements, ignoring NaN values.
     
@@ -206,7 +251,7 @@ def min(data: np.ndarray, axis: Optional[int] = None) -> Union[float, np.ndarray
         raise ValueError("No valid values found in array (all NaN)")
     return result
 
-def max(data: np.ndarray, axis: Optional[int] = None) -> Union[float, np.ndarray]:
+def nanmax(data: np.ndarray, axis: Optional[int] = None) -> Union[float, np.ndarray]:
     """
     Calculate the maximum of array elements, ignoring NaN values.
     
@@ -227,6 +272,11 @@ def max(data: np.ndarray, axis: Optional[int] = None) -> Union[float, np.ndarray
         raise ValueError("No valid values found in array (all NaN)")
     return result
 
+# Backwards compatible aliases
+min = nanmin
+max = nanmax
+sum = nansum
+
 def median(data: np.ndarray, axis: Optional[int] = None) -> Union[float, np.ndarray]:
     """Calculate the median of array elements."""
     return np.median(data, axis=axis)
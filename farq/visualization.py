@@ -3,6 +3,7 @@ Visualization functions for raster data analysis.
 
 This module provides functions for:
 - Single raster visualization
+- Repeated display of rasters in a reused figure
 - Side-by-side comparisons
 - Change detection visualization
 - Distribution analysis
@@ -10,10 +11,149 @@ This module provides functions for:
 
 All functions include input validation and detailed error messages.
 """
+import warnings
 import matplotlib.pyplot as plt
 import numpy as np
 from typing import Optional, Tuple, Union, List
-from .utils import min, max
+from . import _kernels
+
+def _downsample_for_display(data: np.ndarray, fig: plt.Figure, n_panels: int = 1) -> np.ndarray:
+    """
+    Area-average an array that is much larger than the figure can show.
+    
+    Arrays more than four times larger than the figure in display pixels are
+    averaged over square blocks down to about twice the display size, which
+    looks the same on screen but avoids rasterizing every pixel. NaN values
+    are ignored in the averages.
+    
+    Args:
+        data: 2D array
+        fig: Figure the array will be shown in
+        n_panels: Number of panels side by side in the figure
+        
+    Returns:
+        The downsampled array, or `data` unchanged if it is small enough
+    """
+    display_width, display_height = fig.get_size_inches() * fig.dpi
+    display_width /= n_panels
+    ratio = np.max([data.shape[0] / display_height, data.shape[1] / display_width])
+    if ratio <= 4:
+        return data
+    
+    factor = int(np.ceil(ratio / 2))
+    dtype = data.dtype if np.issubdtype(data.dtype, np.floating) else np.float32
+    height, width = data.shape
+    padded = np.pad(data.astype(dtype, copy=False),
+                    ((0, -height % factor), (0, -width % factor)),
+                    constant_values=np.nan)
+    blocks = padded.reshape(padded.shape[0] // factor, factor, padded.shape[1] // factor, factor)
+    with warnings.catch_warnings():
+        # Blocks that are entirely NaN stay NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanmean(blocks, axis=(1, 3))
+
+def _prepare_display(data: np.ndarray,
+                     fig: plt.Figure,
+                     vmin: Optional[float],
+                     vmax: Optional[float],
+                     n_panels: int = 1) -> Tuple[np.ndarray, Optional[float], Optional[float], Optional[Tuple]]:
+    """
+    Downsample an array for display, keeping its color limits and coordinates.
+    
+    Missing color limits of a downsampled array are taken from the full
+    array, and the returned extent keeps the pixel coordinates of the full
+    array.
+    
+    Returns:
+        Tuple of (display data, vmin, vmax, extent). The extent is None when
+        the array is shown at full resolution.
+    """
+    display_data = _downsample_for_display(data, fig, n_panels)
+    if display_data is data:
+        return data, vmin, vmax, None
+    
+    if vmin is None or vmax is None:
+        lo, hi = _kernels.minmax(data)
+        vmin = lo if vmin is None else vmin
+        vmax = hi if vmax is None else vmax
+    extent = (-0.5, data.shape[1] - 0.5, data.shape[0] - 0.5, -0.5)
+    return display_data, vmin, vmax, extent
+
+def _show_image(ax: plt.Axes,
+                data: np.ndarray,
+                cmap: str,
+                vmin: Optional[float],
+                vmax: Optional[float],
+                colorbar_label: Optional[str],
+                extent: Optional[Tuple[float, float, float, float]] = None):
+    """
+    Show an array in an axis, reusing the image of a previous call.
+    
+    The first call creates the image and its colorbar. If the axis already
+    shows an image, its data, colormap, extent, color limits and colorbar
+    label are replaced instead, so showing a series of rasters does not
+    rebuild the figure.
+    
+    Returns:
+        The AxesImage
+    """
+    if not ax.images:
+        im = ax.imshow(data, cmap=cmap, vmin=vmin, vmax=vmax, extent=extent)
+        ax.figure.colorbar(im, ax=ax, label=colorbar_label)
+        return im
+    
+    im = ax.images[0]
+    height, width = data.shape[:2]
+    im.set_data(data)
+    im.set_extent(extent or (-0.5, width - 0.5, height - 0.5, -0.5))
+    im.set_cmap(cmap)
+    im.norm.vmin = vmin
+    im.norm.vmax = vmax
+    im.autoscale_None()
+    if im.colorbar is not None:
+        im.colorbar.set_label(colorbar_label or "")
+    return im
+
+def _histogram(data: np.ndarray,
+               bins: int,
+               density: bool,
+               reflectance_scale: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Histogram of the finite values of an array, without copying it.
+    
+    The bin range is found in one pass over the array and NaN values fall
+    outside it, so no NaN-free or flattened copy is made. Reflectance
+    scaling is applied to the bin edges instead of the data: explicit edges,
+    given in reflectance units, are multiplied by the scale before binning.
+    
+    Returns:
+        Tuple of (bar heights, bin edges)
+    """
+    lo, hi = _kernels.minmax(data)
+    if not (np.isfinite(lo) and np.isfinite(hi)):
+        # Infinite values (rare) or no values at all
+        finite = data[np.isfinite(data)]
+        lo, hi = (finite.min(), finite.max()) if finite.size else (0.0, 1.0)
+    
+    if isinstance(bins, (int, np.integer)):
+        edges = np.histogram_bin_edges(data[:0], bins=bins, range=(lo, hi))
+        counts = _kernels.histogram(data, edges)
+    elif isinstance(bins, str):
+        counts, edges = np.histogram(data, bins=bins, range=(lo, hi))
+    else:
+        edges = np.asarray(bins, dtype=np.float64)
+        raw_edges = edges if reflectance_scale is None else edges * reflectance_scale
+        counts, _ = np.histogram(data, bins=raw_edges)
+        reflectance_scale = None  # `edges` are already in reflectance units
+    if reflectance_scale is not None:
+        edges = edges / reflectance_scale
+    if not density:
+        return counts, edges
+    
+    total = counts.sum()
+    if total == 0:
+        return np.zeros(counts.shape), edges
+    return counts / (total * np.diff(edges)), edges
 
 def plot(data: np.ndarray, 
          title: str = None,
@@ -22,12 +162,30 @@ def plot(data: np.ndarray,
          vmin: Optional[float] = None,
          vmax: Optional[float] = None,
          colorbar_label: str = None,
-         reflectance_scale: Optional[float] = None) -> plt.Figure:
+         reflectance_scale: Optional[float] = None,
+         ax: Optional[plt.Axes] = None) -> plt.Figure:
     """
     Plot a single raster or array.
+    
+    Pass `ax` to draw into an existing axis. When the axis already shows a
+    raster from a previous call, the image is updated in place, which is
+    much faster than building a new figure for every raster in a series.
+    
+    Args:
+        data: 2D array
+        title: Plot title (optional)
+        cmap: Colormap name (default: "viridis")
+        figsize: Figure size as (width, height), used when `ax` is not given
+        vmin: Minimum value for colormap scaling
+        vmax: Maximum value for colormap scaling
+        colorbar_label: Label for the colorbar (optional)
+        reflectance_scale: Scale factor for reflectance data (e.g., 10000 for Landsat 8 SR)
+        ax: Axis to draw into (optional). By default all figures are closed
+            and a new figure is created.
+    
+    Returns:
+        matplotlib.figure.Figure: The figure containing the plot
     """
-    # Close any existing figures to prevent multiple plots
-    plt.close('all')
     
     # Input validation
     if not isinstance(data, np.ndarray):
@@ -39,31 +197,113 @@ def plot(data: np.ndarray,
         raise ValueError(f"Input must be a 2D array, got shape {data.shape}")
     
     # Apply reflectance scaling if provided
-    plot_data = data.copy()
+    plot_data = data
     if reflectance_scale is not None:
         plot_data = plot_data / reflectance_scale
     
-    # Create new figure and axis
-    fig, ax = plt.subplots(figsize=figsize)
+    # Create new figure and axis, closing existing figures to prevent
+    # multiple plots
+    new_figure = ax is None
+    if new_figure:
+        plt.close('all')
+        fig, ax = plt.subplots(figsize=figsize)
+    fig = ax.figure
     
-    # Plot data
-    im = ax.imshow(plot_data, cmap=cmap, vmin=vmin, vmax=vmax)
+    # Downsample large rasters to the display resolution, keeping the color
+    # limits and pixel coordinates of the full array
+    display_data, vmin, vmax, extent = _prepare_display(plot_data, fig, vmin, vmax)
     
-    # Add colorbar
-    if colorbar_label:
-        fig.colorbar(im, ax=ax, label=colorbar_label)
-    else:
-        fig.colorbar(im, ax=ax)
+    # Plot data with a colorbar
+    _show_image(ax, display_data, cmap, vmin, vmax, colorbar_label, extent)
     
     # Add title if provided
     if title:
         ax.set_title(title)
     
     ax.axis('off')
-    fig.tight_layout()
+    if new_figure:
+        fig.tight_layout()
     
     return fig
 
+class FastPlotter:
+    """
+    Display a sequence of rasters in a single reused figure.
+    
+    The figure, image and colorbar are created on the first call to `plot`;
+    later calls only replace the image data, color limits and title, which
+    avoids the cost of building a new figure and colorbar for every raster.
+    A new figure is created if the previous one has been closed.
+    
+    Example:
+        >>> plotter = farq.FastPlotter(cmap="RdYlBu", colorbar_label="NDWI")
+        >>> plotter.plot(ndwi_1985, title="1985", vmin=-1, vmax=1)
+        >>> plotter.plot(ndwi_2024, title="2024", vmin=-1, vmax=1)
+    """
+    
+    def __init__(self,
+                 cmap: str = "viridis",
+                 figsize: Tuple[int, int] = (10, 8),
+                 colorbar_label: str = None):
+        """
+        Args:
+            cmap: Default colormap name (default: "viridis")
+            figsize: Figure size as (width, height)
+            colorbar_label: Label for the colorbar (optional)
+        """
+        self.cmap = cmap
+        self.figsize = figsize
+        self.colorbar_label = colorbar_label
+        self.fig = None
+        self.ax = None
+        self.im = None
+    
+    def plot(self,
+             data: np.ndarray,
+             title: str = None,
+             vmin: Optional[float] = None,
+             vmax: Optional[float] = None,
+             cmap: Optional[str] = None,
+             reflectance_scale: Optional[float] = None) -> plt.Figure:
+        """
+        Show a raster in the plotter's figure.
+        
+        Args:
+            data: 2D array
+            title: Plot title (optional)
+            vmin: Minimum value for colormap scaling (default: data minimum)
+            vmax: Maximum value for colormap scaling (default: data maximum)
+            cmap: Colormap name (default: the plotter's colormap)
+            reflectance_scale: Scale factor for reflectance data (e.g., 10000 for Landsat 8 SR)
+        
+        Returns:
+            matplotlib.figure.Figure: The plotter's figure
+            
+        Raises:
+            TypeError: If input is not a numpy array
+            ValueError: If array is empty or not 2D
+        """
+        if not isinstance(data, np.ndarray):
+            raise TypeError(f"Input must be a numpy array, got {type(data)}")
+        if data.size == 0:
+            raise ValueError("Input array is empty")
+        if data.ndim != 2:
+            raise ValueError(f"Input must be a 2D array, got shape {data.shape}")
+        
+        plot_data = data if reflectance_scale is None else data / reflectance_scale
+        
+        new_figure = self.fig is None or not plt.fignum_exists(self.fig.number)
+        if new_figure:
+            self.fig, self.ax = plt.subplots(figsize=self.figsize)
+        self.im = _show_image(self.ax, plot_data, cmap or self.cmap, vmin, vmax, self.colorbar_label)
+        if new_figure:
+            self.ax.axis('off')
+            self.fig.tight_layout()
+        
+        self.ax.set_title(title or "")
+        self.fig.canvas.draw_idle()
+        return self.fig
+
 def compare(data1: np.ndarray, 
             data2: np.ndarray,
             title1: str = None,
@@ -73,10 +313,14 @@ def compare(data1: np.ndarray,
             vmin: Optional[float] = None,
             vmax: Optional[float] = None,
             colorbar_label: str = None,
-            reflectance_scale: Optional[float] = None) -> plt.Figure:
+            reflectance_scale: Optional[float] = None,
+            axes: Optional[Tuple[plt.Axes, plt.Axes]] = None) -> plt.Figure:
     """
     Compare two rasters or arrays side by side.
     
+    Pass `axes` to draw into two existing axes; as with `plot`, images shown
+    by a previous call are updated in place.
+    
     Args:
         data1: First 2D array
         data2: Second 2D array
@@ -88,9 +332,10 @@ def compare(data1: np.ndarray,
         vmax: Maximum value for colormap scaling
         colorbar_label: Label for both colorbars (optional)
         reflectance_scale: Scale factor for reflectance data (e.g., 10000 for Landsat 8 SR)
+        axes: Pair of axes to draw into (optional)
     
     Returns:
-        matplotlib.figure.Figure: The created figure
+        matplotlib.figure.Figure: The figure containing the plots
     """
     # Convert inputs to numpy arrays
     if not isinstance(data1, np.ndarray):
@@ -107,41 +352,42 @@ def compare(data1: np.ndarray,
         raise ValueError(f"Input arrays must have the same shape: {data1.shape} != {data2.shape}")
     
     # Apply reflectance scaling if provided
-    plot_data1 = data1.copy()
-    plot_data2 = data2.copy()
+    plot_data1 = data1
+    plot_data2 = data2
     if reflectance_scale is not None:
         plot_data1 = plot_data1 / reflectance_scale
         plot_data2 = plot_data2 / reflectance_scale
     
     # Create figure and axes
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=figsize)
+    new_figure = axes is None
+    if new_figure:
+        fig, axes = plt.subplots(1, 2, figsize=figsize)
+    ax1, ax2 = axes
+    fig = ax1.figure
     
-    # Calculate vmin/vmax if not provided
+    # Calculate shared vmin/vmax over both arrays if not provided
     if vmin is None or vmax is None:
-        vmin = min(plot_data1) if vmin is None else vmin
-        vmax = max(plot_data1) if vmax is None else vmax
-    
-    # Plot first array
-    im1 = ax1.imshow(plot_data1, cmap=cmap, vmin=vmin, vmax=vmax)
-    if colorbar_label:
-        fig.colorbar(im1, ax=ax1, label=colorbar_label)
-    else:
-        fig.colorbar(im1, ax=ax1)
+        lo1, hi1 = _kernels.minmax(plot_data1)
+        lo2, hi2 = _kernels.minmax(plot_data2)
+        vmin = np.fmin(lo1, lo2) if vmin is None else vmin
+        vmax = np.fmax(hi1, hi2) if vmax is None else vmax
+    
+    # Plot first array, downsampled to the size of one panel
+    display_data, _, _, extent = _prepare_display(plot_data1, fig, vmin, vmax, n_panels=2)
+    _show_image(ax1, display_data, cmap, vmin, vmax, colorbar_label, extent)
     if title1:
         ax1.set_title(title1)
     ax1.axis('off')
     
     # Plot second array
-    im2 = ax2.imshow(plot_data2, cmap=cmap, vmin=vmin, vmax=vmax)
-    if colorbar_label:
-        fig.colorbar(im2, ax=ax2, label=colorbar_label)
-    else:
-        fig.colorbar(im2, ax=ax2)
+    display_data, _, _, extent = _prepare_display(plot_data2, fig, vmin, vmax, n_panels=2)
+    _show_image(ax2, display_data, cmap, vmin, vmax, colorbar_label, extent)
     if title2:
         ax2.set_title(title2)
     ax2.axis('off')
     
-    plt.tight_layout()
+    if new_figure:
+        fig.tight_layout()
     return fig
 
 def changes(data: np.ndarray, 
@@ -152,7 +398,8 @@ def changes(data: np.ndarray,
            vmax: Optional[float] = None,
            symmetric: bool = True,
            colorbar_label: str = "Change",
-           reflectance_scale: Optional[float] = None) -> plt.Figure:
+           reflectance_scale: Optional[float] = None,
+           ax: Optional[plt.Axes] = None) -> plt.Figure:
     """
     Plot change detection results with optional symmetric scaling.
     
@@ -166,9 +413,10 @@ def changes(data: np.ndarray,
         symmetric: If True, use symmetric scaling around zero
         colorbar_label: Label for the colorbar
         reflectance_scale: Scale factor for reflectance data (e.g., 10000 for Landsat 8 SR)
+        ax: Axis to draw into (optional, see `plot`)
     
     Returns:
-        matplotlib.figure.Figure: The created figure
+        matplotlib.figure.Figure: The figure containing the plot
         
     Raises:
         TypeError: If input is not a numpy array
@@ -183,27 +431,32 @@ def changes(data: np.ndarray,
         raise ValueError(f"Input must be a 2D array, got shape {data.shape}")
     
     # Apply reflectance scaling if provided
-    plot_data = data.copy()
+    plot_data = data
     if reflectance_scale is not None:
         plot_data = plot_data / reflectance_scale
     
     # Create figure and axis
-    fig, ax = plt.subplots(figsize=figsize)
+    new_figure = ax is None
+    if new_figure:
+        fig, ax = plt.subplots(figsize=figsize)
+    fig = ax.figure
     
     # Calculate symmetric scaling if needed
     if symmetric and (vmin is None or vmax is None):
-        abs_max = max(np.abs(plot_data))
+        lo, hi = _kernels.minmax(plot_data)
+        abs_max = np.fmax(-lo, hi)
         vmin = -abs_max if vmin is None else vmin
         vmax = abs_max if vmax is None else vmax
     
-    # Plot data
-    im = ax.imshow(plot_data, cmap=cmap, vmin=vmin, vmax=vmax)
-    plt.colorbar(im, label=colorbar_label)
+    # Plot data, downsampled to the display resolution
+    display_data, vmin, vmax, extent = _prepare_display(plot_data, fig, vmin, vmax)
+    _show_image(ax, display_data, cmap, vmin, vmax, colorbar_label, extent)
     
     if title:
         ax.set_title(title)
     ax.axis('off')
-    plt.tight_layout()
+    if new_figure:
+        fig.tight_layout()
     
     return fig
 
@@ -215,13 +468,15 @@ def hist(data: Union[np.ndarray, List],
          xlabel: str = "Value",
          ylabel: str = None,
          alpha: float = 0.6,
-         reflectance_scale: Optional[float] = None) -> plt.Figure:
+         reflectance_scale: Optional[float] = None,
+         ax: Optional[plt.Axes] = None) -> plt.Figure:
     """
     Plot histogram of values with customizable labels.
     
     Args:
         data: Input data (numpy array or list)
-        bins: Number of histogram bins
+        bins: Number of histogram bins, or bin edges in the units of the
+            plotted (reflectance-scaled) values
         title: Plot title (optional)
         figsize: Figure size as (width, height)
         density: If True, plot density instead of counts
@@ -229,9 +484,11 @@ def hist(data: Union[np.ndarray, List],
         ylabel: Label for y-axis (defaults to "Density" or "Count")
         alpha: Transparency of the histogram bars
         reflectance_scale: Scale factor for reflectance data (e.g., 10000 for Landsat 8 SR)
+        ax: Axis to draw into (optional). The histogram is added to the
+            axis, so several histograms can be overlaid.
     
     Returns:
-        matplotlib.figure.Figure: The created figure
+        matplotlib.figure.Figure: The figure containing the plot
         
     Raises:
         ValueError: If input array is empty
@@ -243,19 +500,17 @@ def hist(data: Union[np.ndarray, List],
     if data.size == 0:
         raise ValueError("Input array is empty")
     
-    # Apply reflectance scaling if provided
-    plot_data = data.copy()
-    if reflectance_scale is not None:
-        plot_data = plot_data / reflectance_scale
-    
-    # Flatten array if multidimensional
-    plot_data = plot_data.ravel()
+    # Bin the values, applying reflectance scaling to the bin edges
+    heights, edges = _histogram(data, bins, density, reflectance_scale)
     
     # Create figure and axis
-    fig, ax = plt.subplots(figsize=figsize)
+    new_figure = ax is None
+    if new_figure:
+        fig, ax = plt.subplots(figsize=figsize)
+    fig = ax.figure
     
     # Plot histogram
-    ax.hist(plot_data, bins=bins, density=density, alpha=alpha)
+    ax.bar(edges[:-1], heights, width=np.diff(edges), align='edge', alpha=alpha)
     
     # Add labels and title
     if title:
@@ -264,7 +519,8 @@ def hist(data: Union[np.ndarray, List],
     ax.set_ylabel(ylabel if ylabel else ('Density' if density else 'Count'))
     
     ax.grid(True, alpha=0.3)
-    plt.tight_layout()
+    if new_figure:
+        fig.tight_layout()
     
     return fig
 
@@ -287,7 +543,8 @@ def distribution_comparison(data1: Union[np.ndarray, List],
         data2: Second dataset (numpy array or list)
         title1: Title for first plot (optional)
         title2: Title for second plot (optional)
-        bins: Number of histogram bins
+        bins: Number of histogram bins, or bin edges in the units of the
+            plotted (reflectance-scaled) values
         figsize: Figure size as (width, height)
         density: If True, plot density instead of counts
         xlabel: Label for x-axis
@@ -310,22 +567,15 @@ def distribution_comparison(data1: Union[np.ndarray, List],
     if data1.size == 0 or data2.size == 0:
         raise ValueError("Input arrays are empty")
     
-    # Apply reflectance scaling if provided
-    plot_data1 = data1.copy()
-    plot_data2 = data2.copy()
-    if reflectance_scale is not None:
-        plot_data1 = plot_data1 / reflectance_scale
-        plot_data2 = plot_data2 / reflectance_scale
-    
-    # Flatten arrays if multidimensional
-    plot_data1 = plot_data1.ravel()
-    plot_data2 = plot_data2.ravel()
+    # Bin the values, applying reflectance scaling to the bin edges
+    heights1, edges1 = _histogram(data1, bins, density, reflectance_scale)
+    heights2, edges2 = _histogram(data2, bins, density, reflectance_scale)
     
     # Create figure and axes
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=figsize)
     
     # Plot first histogram
-    ax1.hist(plot_data1, bins=bins, density=density, alpha=alpha)
+    ax1.bar(edges1[:-1], heights1, width=np.diff(edges1), align='edge', alpha=alpha)
     if title1:
         ax1.set_title(title1)
     ax1.set_xlabel(xlabel)
@@ -333,7 +583,7 @@ def distribution_comparison(data1: Union[np.ndarray, List],
     ax1.grid(True, alpha=0.3)
     
     # Plot second histogram
-    ax2.hist(plot_data2, bins=bins, density=density, alpha=alpha)
+    ax2.bar(edges2[:-1], heights2, width=np.diff(edges2), align='edge', alpha=alpha)
     if title2:
         ax2.set_title(title2)
     ax2.set_xlabel(xlabel)
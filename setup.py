@@ -38,8 +38,15 @@ setup(
         "joblib>=1.1.0",
     ],
     extras_require={
+        "fast": [
+            "numba>=0.56",
+        ],
+        "dask": [
+            "dask[array]>=2021.1",
+        ],
         "dev": [
             "pytest>=6.0",
+            "pytest-benchmark>=4.0",
             "black>=21.0",
             "flake8>=3.9.0",
         ],
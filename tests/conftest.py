@@ -0,0 +1,91 @@
+"""
+Shared fixtures for the Farq test suite.
+"""
+import os
+import time
+from pathlib import Path
+
+# Keep BLAS/OpenMP libraries single-threaded, so the numba kernels are the
+# only parallel region and timings do not suffer from oversubscription.
+# This must happen before numpy is first imported.
+for _var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+    os.environ.setdefault(_var, "1")
+
+import matplotlib
+
+# Render off-screen so plot timings measure rasterization, not a GUI event
+# loop. Conftest is imported before the test modules, and so before pyplot.
+matplotlib.use("Agg", force=True)
+
+import numpy as np
+import pytest
+
+LARGE_SHAPE = (5000, 5000)
+
+def pytest_configure(config):
+    """Configure matplotlib for many short-lived test figures."""
+    matplotlib.rcParams["figure.max_open_warning"] = 0
+    matplotlib.rcParams["path.simplify_threshold"] = 1.0
+
+@pytest.fixture(scope="session", autouse=True)
+def _warm_matplotlib():
+    """Draw one small farq plot so font and colormap setup is not timed."""
+    import matplotlib.pyplot as plt
+    import farq
+    
+    fig = farq.plot(np.zeros((4, 4)))
+    fig.canvas.draw()
+    plt.close(fig)
+
+@pytest.fixture(scope="session", autouse=True)
+def _warm_kernels():
+    """Compile (or load from cache) the NDWI kernel before any test times it."""
+    import farq
+    
+    band = np.ones((16, 16), dtype=np.float32)
+    farq.ndwi(band, band)
+
+@pytest.fixture(scope="session")
+def clock_overhead():
+    """Smallest observed cost in ns of a pair of `time.perf_counter_ns` calls."""
+    def pair():
+        start = time.perf_counter_ns()
+        return time.perf_counter_ns() - start
+    return min(pair() for _ in range(1000))
+
+@pytest.fixture
+def rng():
+    """Seeded PCG64 generator; draw float32 data with `rng.random(shape, dtype=np.float32)`."""
+    return np.random.default_rng(0)
+
+def _cached_random(config, seed, shape=LARGE_SHAPE, dtype=np.float32):
+    """
+    Read-only memmap of random data cached in pytest's cache directory.
+    
+    The file is generated once (written under a temporary name, then renamed,
+    so an interrupted run never leaves a partial file behind); later sessions
+    only fault the pages in from the page cache instead of rerunning the PRNG.
+    The seed, shape and dtype are part of the file name, so changing any of
+    them generates a new file, and `pytest --cache-clear` removes them.
+    """
+    dtype = np.dtype(dtype)
+    name = f"rand_seed{seed}_{'x'.join(map(str, shape))}_{dtype.name}.bin"
+    path = Path(config.cache.mkdir("farq_bench")) / name
+    if not path.exists():
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        arr = np.memmap(tmp, mode="w+", dtype=dtype, shape=shape)
+        np.random.default_rng(seed).random(shape, dtype=dtype, out=arr)
+        arr.flush()
+        del arr
+        os.replace(tmp, path)
+    return np.memmap(path, mode="r", dtype=dtype, shape=shape)
+
+@pytest.fixture(scope="session")
+def rand_5k_a(pytestconfig):
+    """5000x5000 float32 random array, memory-mapped from a cached file."""
+    return _cached_random(pytestconfig, 0)
+
+@pytest.fixture(scope="session")
+def rand_5k_b(pytestconfig):
+    """Second 5000x5000 float32 random array, independent of `rand_5k_a`."""
+    return _cached_random(pytestconfig, 1)
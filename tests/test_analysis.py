@@ -0,0 +1,150 @@
+"""
+Tests for water analysis functions.
+"""
+import numpy as np
+import pytest
+import farq
+
+@pytest.fixture
+def water_mask():
+    """Mask with three water bodies of 1, 4 and 9 pixels."""
+    mask = np.zeros((10, 10), dtype=bool)
+    mask[0, 0] = True
+    mask[2:4, 2:4] = True
+    mask[6:9, 6:9] = True
+    return mask
+
+def test_get_water_bodies(water_mask):
+    """Test water body labeling and areas."""
+    labeled, bodies = farq.get_water_bodies(water_mask, pixel_size=10.0)
+    
+    assert labeled.max() == 3
+    assert labeled.dtype == np.int16
+    assert [bodies[i]["area"] for i in (1, 2, 3)] == pytest.approx([1e-4, 4e-4, 9e-4])
+
+def test_get_water_bodies_min_area(water_mask):
+    """Test small water bodies are removed and labels stay consecutive."""
+    labeled, bodies = farq.get_water_bodies(water_mask, pixel_size=10.0,
+                                            min_area=400.0, calculate_shapes=True)
+    
+    assert sorted(bodies) == [1, 2]
+    assert bodies[1]["area"] == pytest.approx(4e-4)
+    assert bodies[2]["area"] == pytest.approx(9e-4)
+    assert labeled[0, 0] == 0
+    assert np.all(labeled[2:4, 2:4] == 1)
+    assert np.all(labeled[6:9, 6:9] == 2)
+    assert labeled.dtype == np.int16
+
+def test_water_stats_body_sizes(water_mask):
+    """Test body size statistics and cropped shape metrics."""
+    stats = farq.water_stats(water_mask, pixel_size=10.0, calculate_shapes=True)
+    
+    assert stats["num_water_bodies"] == 3
+    assert stats["mean_body_size"] == pytest.approx(14e-4 / 3)
+    assert stats["largest_body"] == pytest.approx(9e-4)
+    
+    labeled, bodies = farq.get_water_bodies(water_mask, calculate_shapes=True)
+    for i in (1, 2, 3):
+        expected = farq.calculate_shape_metrics(labeled == i)
+        assert {k: bodies[i][k] for k in expected} == pytest.approx(expected)
+
+@pytest.mark.parametrize("n_strips", [None, 1, 3, 64])
+def test_label_matches_ndimage(n_strips):
+    """Test strip-parallel labelling matches scipy.ndimage.label."""
+    from scipy import ndimage
+    from farq import _kernels
+    
+    mask = np.random.default_rng(0).random((64, 80)) < 0.55
+    labeled, num = _kernels.label(mask, n_strips)
+    expected, expected_num = ndimage.label(mask)
+    
+    assert num == expected_num
+    assert np.array_equal(labeled, expected)
+
+@pytest.mark.parametrize("threshold", [0.0, 0.2, -0.5])
+def test_water_area_from_bands(threshold):
+    """Test the single-pass area matches thresholding the NDWI array."""
+    rng = np.random.default_rng(0)
+    green, nir = rng.integers(0, 10000, size=(2, 50, 40), dtype=np.uint16)
+    green[0, :5] = 0
+    nir[0, :5] = 0
+    
+    area = farq.water_area_from_bands(green, nir, pixel_size=30.0, threshold=threshold)
+    expected = farq.water_stats(farq.ndwi(green, nir) > threshold)["total_area"]
+    assert area == pytest.approx(expected)
+    
+    green, nir = green.astype(np.float16), nir.astype(np.float16)
+    area = farq.water_area_from_bands(green, nir, pixel_size=30.0, threshold=threshold)
+    expected = farq.water_stats(farq.ndwi(green, nir) > threshold)["total_area"]
+    assert area == pytest.approx(expected)
+
+def test_water_area_from_dask_bands():
+    """Test dask bands are counted block by block without a TypeError."""
+    da = pytest.importorskip("dask.array")
+    rng = np.random.default_rng(0)
+    green, nir = rng.integers(0, 10000, size=(2, 50, 40), dtype=np.uint16)
+    
+    area = farq.water_area_from_bands(da.from_array(green, chunks=20), da.from_array(nir, chunks=20))
+    assert area == pytest.approx(farq.water_area_from_bands(green, nir))
+
+def test_water_change():
+    """Test gained, lost and stable water between two masks."""
+    rng = np.random.default_rng(0)
+    mask1 = rng.random((50, 40)) > 0.5
+    mask2 = rng.random((50, 40)) > 0.5
+    
+    result = farq.water_change(mask1, mask2, pixel_size=10.0)
+    
+    gained = mask2 & ~mask1
+    lost = mask1 & ~mask2
+    assert result["gained_area"] == pytest.approx(gained.sum() * 1e-4)
+    assert result["lost_area"] == pytest.approx(lost.sum() * 1e-4)
+    assert result["change_percent"] == pytest.approx(
+        100 * (gained.sum() - lost.sum()) / mask1.sum())
+    assert np.array_equal(result["change_mask"], gained.astype(int) - lost.astype(int))
+    assert np.array_equal(result["stable_water"], mask1 & mask2)
+
+def test_bitmask_operations():
+    """Test BitMask set operations and counts against numpy bool arrays."""
+    rng = np.random.default_rng(1)
+    a = rng.random((13, 7)) > 0.5
+    b = rng.random((13, 7)) > 0.3
+    bm_a, bm_b = farq.BitMask(a), farq.BitMask(b)
+    
+    assert np.array_equal(bm_a.to_array(), a)
+    assert bm_a.count() == a.sum()
+    assert (bm_a & bm_b).count() == (a & b).sum()
+    assert (bm_a | bm_b).count() == (a | b).sum()
+    assert (bm_a ^ bm_b).count() == (a ^ b).sum()
+    assert (~bm_a).count() == (~a).sum()
+    assert np.array_equal((bm_b & ~bm_a).to_array(), b & ~a)
+    
+    with pytest.raises(ValueError):
+        bm_a & farq.BitMask(a[:-1])
+
+def test_analysis_accepts_bitmask(water_mask):
+    """Test analysis functions give the same results for packed masks."""
+    packed = farq.BitMask(water_mask)
+    
+    assert farq.water_stats(packed) == farq.water_stats(water_mask)
+    labeled, bodies = farq.get_water_bodies(packed)
+    assert np.array_equal(labeled, farq.get_water_bodies(water_mask)[0])
+    
+    change = farq.water_change(packed, farq.BitMask(~water_mask))
+    assert change["lost_area"] == pytest.approx(water_mask.sum() * 0.0009)
+
+def test_water_change_min_area():
+    """Test filtered changes keep large gains/losses and drop small ones."""
+    mask1 = np.zeros((20, 20), dtype=bool)
+    mask2 = np.zeros((20, 20), dtype=bool)
+    mask2[2:8, 2:8] = True    # 36 pixel gain
+    mask1[12:18, 12:18] = True  # 36 pixel loss
+    mask2[0, 19] = True       # Single pixel gain, filtered out
+    
+    result = farq.water_change(mask1, mask2, pixel_size=10.0, min_change_area=400.0)
+    
+    assert np.all(result["change_mask"][2:8, 2:8] == 1)
+    assert np.all(result["change_mask"][12:18, 12:18] == -1)
+    assert result["change_mask"][0, 19] == 0
+    assert result["gained_area"] == pytest.approx(36e-4)
+    assert result["lost_area"] == pytest.approx(36e-4)
@@ -4,7 +4,8 @@ Tests for core functionality of the Farq library.
 import numpy as np
 import pytest
 import farq
-from farq.core import ndwi
+from rasterio.enums import Resampling
+from farq.indices import ndwi
 
 def test_min():
     """Test minimum value calculation."""
@@ -31,6 +32,98 @@ def test_sum():
     data = np.array([[1, 2, 3], [4, 5, 6]])
     assert farq.sum(data) == 21
 
+def test_mean_std_ignore_nan():
+    """Test mean and std match NumPy's NaN-ignoring reductions."""
+    rng = np.random.default_rng(0)
+    data = rng.random((300, 200), dtype=np.float32) * 1000 + 1e4
+    data.flat[::7] = np.nan
+    expected = data.astype(np.float64)
+    assert np.isclose(farq.mean(data), np.nanmean(expected), rtol=1e-12)
+    assert np.isclose(farq.std(data), np.nanstd(expected), rtol=1e-9)
+    
+    counts = np.arange(7, dtype=np.uint8)
+    assert farq.mean(counts) == 3
+    assert farq.std(counts) == 2
+    assert farq.mean(counts.astype(np.float16)) == 3
+    assert farq.std(counts.astype(np.float16)) == 2
+    np.testing.assert_allclose(farq.std(expected, axis=0), np.nanstd(expected, axis=0))
+
+@pytest.mark.parametrize("position", [0, 5000, -1])
+def test_mean_std_infinite_values(position):
+    """Test infinite values give the same mean and std wherever they occur."""
+    data = np.ones(10001)
+    data[position] = np.inf
+    assert farq.mean(data) == np.inf
+    with pytest.raises(ValueError):
+        farq.std(data)
+    
+    data[position] = -np.inf
+    assert farq.mean(data) == -np.inf
+    data[position - 1] = np.inf
+    with pytest.raises(ValueError):
+        farq.mean(data)
+
+def test_nan_reductions_do_not_shadow_builtins():
+    """Test nanmin/nanmax/nansum and that star imports keep the builtins."""
+    data = np.array([[1, np.nan, 3], [4, 5, 6]])
+    assert farq.nanmin(data) == 1
+    assert farq.nanmax(data) == 6
+    assert farq.nansum(data) == 19
+    assert farq.min is farq.nanmin
+    
+    namespace = {}
+    exec("from farq import *", namespace)
+    exec("from farq.utils import *", namespace)
+    assert not {'min', 'max', 'sum'} & set(namespace)
+
+def test_validate_array():
+    """Test array validation rejects empty and all-NaN arrays only."""
+    farq.validate_array(np.zeros((3, 3), dtype=np.uint16))
+    farq.validate_array(np.array([1.0, np.nan]))
+    farq.validate_array(np.array([np.nan, 1.0]))
+    
+    with pytest.raises(ValueError):
+        farq.validate_array(np.full((3, 3), np.nan))
+    with pytest.raises(ValueError):
+        farq.validate_array(np.array([]))
+    with pytest.raises(TypeError):
+        farq.validate_array([1, 2, 3])
+
+def test_stats():
+    """Test single-pass statistics match NumPy's NaN-aware functions."""
+    from scipy import stats as sp_stats
+    
+    data = np.random.default_rng(0).normal(size=(60, 50))
+    data[0, :7] = np.nan
+    data[1, 0] = 0.0
+    data[2, 0] = np.inf
+    finite = data[np.isfinite(data)]
+    
+    result = farq.stats(data, bins=20)
+    
+    assert result['min'] == np.nanmin(data)
+    assert result['max'] == np.inf
+    assert result['nan'] == 7 and result['inf'] == 1 and result['zeros'] == 1
+    assert result['valid'] == finite.size
+    assert result['median'] == pytest.approx(np.nanmedian(data))
+    assert result['percentiles']['25'] == pytest.approx(np.nanpercentile(data, 25))
+    assert result['skewness'] == pytest.approx(sp_stats.skew(finite))
+    assert result['kurtosis'] == pytest.approx(sp_stats.kurtosis(finite))
+    
+    counts, edges = np.histogram(finite, bins=20)
+    assert np.array_equal(result['histogram']['counts'], counts)
+    assert np.allclose(result['histogram']['bin_edges'], edges)
+    
+    finite_result = farq.stats(finite)
+    assert finite_result['mean'] == pytest.approx(np.mean(finite))
+    assert finite_result['std'] == pytest.approx(np.std(finite))
+    
+    half = data.astype(np.float16)
+    half_result = farq.stats(half, bins=20)
+    assert half_result['nan'] == 7 and half_result['inf'] == 1 and half_result['zeros'] == 1
+    assert half_result['min'] == np.nanmin(half)
+    assert half_result['skewness'] == pytest.approx(sp_stats.skew(half[np.isfinite(half)].astype(np.float64)))
+
 def test_resample():
     """Test raster resampling."""
     data = np.array([[1, 2], [3, 4]])
@@ -38,6 +131,36 @@ def test_resample():
     resampled = farq.resample(data, target_shape)
     assert resampled.shape == target_shape
 
+@pytest.mark.parametrize("method", [Resampling.nearest, Resampling.bilinear])
+@pytest.mark.parametrize("target_shape", [(74, 106), (20, 30)])
+def test_resample_matches_gdal(method, target_shape):
+    """Test direct resampling matches GDAL's resampler."""
+    from rasterio.io import MemoryFile
+    
+    data = np.random.default_rng(0).random((37, 53)).astype(np.float32)
+    with MemoryFile() as memfile:
+        with memfile.open(driver='MEM', height=37, width=53, count=1, dtype='float32') as dataset:
+            dataset.write(data, 1)
+            expected = dataset.read(1, out_shape=target_shape, resampling=method)
+    
+    assert np.allclose(farq.resample(data, target_shape, method), expected, atol=1e-6)
+
+@pytest.mark.parametrize("target_shape", [(20, 30), (10, 15), (40, 60)])
+def test_resample_average_block_mean(target_shape):
+    """Test averaging by integer factors matches GDAL's average resampler."""
+    from rasterio.io import MemoryFile
+    
+    data = np.random.default_rng(0).random((40, 60)).astype(np.float32)
+    data[5, 7] = np.nan
+    with MemoryFile() as memfile:
+        with memfile.open(driver='MEM', height=40, width=60, count=1, dtype='float32') as dataset:
+            dataset.write(data, 1)
+            expected = dataset.read(1, out_shape=target_shape, resampling=Resampling.average)
+    
+    result = farq.resample(data, target_shape, Resampling.average)
+    assert result.dtype == np.float32
+    np.testing.assert_allclose(result, expected, atol=1e-6)
+
 def test_read_invalid_file():
     """Test reading an invalid file."""
     with pytest.raises(FileNotFoundError):
@@ -98,8 +221,91 @@ def test_ndwi_range():
     assert np.all(result >= -1.0), "NDWI values below -1.0 found"
     assert np.all(result <= 1.0), "NDWI values above 1.0 found"
     
-    # Check specific cases
-    assert np.isclose(result[0], -0.81818182), "Unexpected value for nir >> green"
-    assert np.isclose(result[1], 0.81818182), "Unexpected value for green >> nir"
+    # Check specific cases (NDWI = (NIR - GREEN) / (NIR + GREEN) for Landsat 8)
+    assert np.isclose(result[0], 0.81818182), "Unexpected value for nir >> green"
+    assert np.isclose(result[1], -0.81818182), "Unexpected value for green >> nir"
     assert np.isclose(result[2], 0.0), "Unexpected value for green == nir"
-    assert np.isclose(result[3], 0.0), "Unexpected value for equal values" 
\ No newline at end of file
+    assert np.isclose(result[3], 0.0), "Unexpected value for equal values"
+
+@pytest.fixture
+def raster_file(tmp_path):
+    """Small uint16 GeoTIFF on disk."""
+    rasterio = pytest.importorskip("rasterio")
+    from rasterio.transform import from_origin
+    
+    data = np.arange(20, dtype=np.uint16).reshape(4, 5)
+    path = tmp_path / "band.tif"
+    profile = dict(driver="GTiff", height=4, width=5, count=1, dtype="uint16",
+                   crs="EPSG:32633", transform=from_origin(0, 120, 30, 30))
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(data, 1)
+    return str(path), data
+
+def test_read_dtype(raster_file):
+    """Test reading converts to float32 by default and can keep native dtype."""
+    path, expected = raster_file
+    
+    data, meta = farq.read(path)
+    assert data.dtype == np.float32
+    assert np.array_equal(data, expected)
+    assert meta["dtype"] == "float32"
+    
+    native, native_meta = farq.read(path, dtype=None)
+    assert native.dtype == np.uint16
+    assert native_meta["dtype"] == "uint16"
+
+def test_read_write_round_trip(raster_file, tmp_path):
+    """Test writing read data with its metadata keeps the values and dtype."""
+    path, _ = raster_file
+    data, meta = farq.read(path)
+    data += 0.5
+    
+    out_path = str(tmp_path / "copy.tif")
+    farq.write(out_path, data, meta)
+    copy, copy_meta = farq.read(out_path, dtype=None)
+    assert copy.dtype == np.float32 and copy_meta["dtype"] == "float32"
+    assert np.array_equal(copy, data)
+
+def test_read_window(raster_file):
+    """Test reading a window returns the subset and matching metadata."""
+    path, expected = raster_file
+    
+    data, meta = farq.read(path, window=((1, 3), (2, 5)))
+    
+    assert np.array_equal(data, expected[1:3, 2:5])
+    assert (meta["height"], meta["width"]) == (2, 3)
+    assert meta["transform"].c == 60 and meta["transform"].f == 90
+
+def test_stream_index(tmp_path):
+    """Test block-by-block NDWI matches the in-memory calculation."""
+    rasterio = pytest.importorskip("rasterio")
+    from rasterio.transform import from_origin
+    
+    rng = np.random.default_rng(0)
+    bands = rng.integers(0, 10000, size=(2, 40, 56), dtype=np.uint16)
+    paths = [str(tmp_path / f"band{i}.tif") for i in range(2)]
+    profile = dict(driver="GTiff", height=40, width=56, count=1, dtype="uint16",
+                   crs="EPSG:32633", transform=from_origin(0, 1200, 30, 30),
+                   tiled=True, blockxsize=16, blockysize=16)
+    for path, band in zip(paths, bands):
+        with rasterio.open(path, "w", **profile) as dst:
+            dst.write(band, 1)
+    
+    out_path = str(tmp_path / "ndwi.tif")
+    farq.stream_index(paths[0], paths[1], out_path)
+    result, meta = farq.read(out_path)
+    
+    assert meta["dtype"] == "float32"
+    assert np.allclose(result, farq.ndwi(bands[0], bands[1]))
+
+def test_read_many(raster_file):
+    """Test concurrent reads match sequential reads and keep their order."""
+    path, expected = raster_file
+    results = farq.read_many([path, path], dtype=None)
+    
+    assert len(results) == 2
+    _, expected_meta = farq.read(path, dtype=None)
+    for data, meta in results:
+        assert np.array_equal(data, expected)
+        assert meta == expected_meta
+    assert farq.read_many([]) == []
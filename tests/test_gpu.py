@@ -0,0 +1,56 @@
+"""
+Tests for the optional GPU implementations.
+"""
+import numpy as np
+import pytest
+import farq
+
+cp = pytest.importorskip("cupy")
+import farq.gpu
+
+@pytest.fixture
+def bands():
+    """Random uint16 green, red, NIR and blue bands."""
+    return np.random.default_rng(0).integers(0, 10000, size=(4, 40, 30), dtype=np.uint16)
+
+def test_gpu_indices_match_cpu(bands):
+    """Test GPU indices match the CPU implementations."""
+    green, red, nir, blue = bands
+    
+    assert np.allclose(farq.gpu.ndwi(green, nir).get(), farq.ndwi(green, nir), atol=1e-6)
+    assert np.allclose(farq.gpu.ndvi(nir, red).get(), farq.ndvi(nir, red), atol=1e-6)
+    assert np.allclose(farq.gpu.savi(nir, red, reflectance_scale=10000).get(),
+                       farq.savi(nir, red, reflectance_scale=10000), atol=1e-5)
+    assert np.allclose(farq.gpu.evi(red, nir, blue, reflectance_scale=10000).get(),
+                       farq.evi(red, nir, blue, reflectance_scale=10000), atol=1e-4)
+
+def test_gpu_water_bodies_match_cpu(bands):
+    """Test GPU water body labels and areas match the CPU implementation."""
+    green, _, nir, _ = bands
+    mask = farq.ndwi(green, nir) > 0
+    
+    labeled, bodies = farq.gpu.get_water_bodies(mask, min_area=2000.0)
+    expected_labeled, expected_bodies = farq.get_water_bodies(mask, min_area=2000.0)
+    
+    assert np.array_equal(labeled.get(), expected_labeled)
+    # The GPU only calculates areas; pytest.approx does not compare nested dicts
+    assert bodies.keys() == expected_bodies.keys()
+    for body_id, body in bodies.items():
+        assert body == pytest.approx({"area": expected_bodies[body_id]["area"]})
+
+def test_indices_dispatch_cupy_arrays(bands):
+    """Test the farq index functions run on the GPU for cupy bands."""
+    green, red, nir, blue = bands
+    d_green, d_red, d_nir, d_blue = (cp.asarray(band) for band in bands)
+    
+    result = farq.ndwi(d_green, d_nir)
+    assert isinstance(result, cp.ndarray)
+    assert np.allclose(result.get(), farq.ndwi(green, nir), atol=1e-6)
+    assert isinstance(farq.ndsi(d_green, d_red), cp.ndarray)
+    assert np.allclose(farq.evi(d_red, d_nir, d_blue, reflectance_scale=10000).get(),
+                       farq.evi(red, nir, blue, reflectance_scale=10000), atol=1e-4)
+    
+    assert farq.water_area_from_bands(d_green, d_nir) == pytest.approx(farq.water_area_from_bands(green, nir))
+    
+    with pytest.raises(ValueError):
+        farq.ndvi(d_nir, d_red, out=cp.empty(d_nir.shape, dtype=cp.float32))
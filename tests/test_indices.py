@@ -121,4 +121,276 @@ def test_savi_parameters():
     savi_05 = farq.savi(nir, red, L=0.5)
     savi_1 = farq.savi(nir, red, L=1.0)
     
-    assert not np.array_equal(savi_05, savi_1) 
\ No newline at end of file
+    assert not np.array_equal(savi_05, savi_1)
+
+def test_normalized_difference_edge_cases():
+    """Test zero denominators and non-finite inputs map to 0."""
+    a = np.array([[0.0, np.nan], [np.inf, 0.3]])
+    b = np.array([[0.0, 0.2], [0.1, 0.1]])
+    
+    nd = farq.calculate_normalized_difference(a, b)
+    
+    assert np.allclose(nd, [[0.0, 0.0], [0.0, 0.5]])
+
+def test_normalized_difference_unsigned_input():
+    """Test unsigned integer bands do not wrap around on subtraction."""
+    a = np.array([[100, 1000]], dtype=np.uint16)
+    b = np.array([[1000, 100]], dtype=np.uint16)
+    
+    nd = farq.calculate_normalized_difference(a, b)
+    
+    assert np.allclose(nd, [[-0.81818182, 0.81818182]])
+
+@pytest.mark.parametrize("index", ["ndvi", "ndwi", "ndbi", "nbr", "ndmi", "ndsi"])
+def test_normalized_difference_float16_input(index):
+    """Test half precision bands are calculated in float32."""
+    a = np.array([[0.1, 0.5], [0.0, 0.25]], dtype=np.float16)
+    b = np.array([[0.3, 0.5], [0.0, 0.75]], dtype=np.float16)
+    
+    result = getattr(farq, index)(a, b)
+    expected = getattr(farq, index)(a.astype(np.float32), b.astype(np.float32))
+    
+    assert result.dtype == np.float32
+    assert np.array_equal(result, expected)
+
+def test_normalized_difference_matches_numpy_kernel():
+    """Test the compiled kernel agrees with the NumPy implementation."""
+    rng = np.random.default_rng(0)
+    a = rng.random((64, 64))
+    b = rng.random((64, 64))
+    b[0, :8] = -a[0, :8]
+    
+    expected = np.empty_like(a)
+    farq._kernels._tiled_apply(lambda a, b, o: farq._kernels._nd_numpy(a, b, o, True),
+                               a, b, out=expected)
+    
+    assert np.allclose(farq.calculate_normalized_difference(a, b), expected)
+
+def test_indices_working_precision():
+    """Test integer bands are computed in float32 unless float64 is requested."""
+    red = np.array([[1000, 2000], [3000, 4000]], dtype=np.uint16)
+    nir = np.array([[2000, 3000], [4000, 5000]], dtype=np.uint16)
+    
+    assert farq.ndvi(nir, red).dtype == np.float32
+    assert farq.savi(nir, red, reflectance_scale=10000).dtype == np.float32
+    assert farq.ndvi(nir.astype(np.float64), red).dtype == np.float64
+    
+    # float32 bands stay float32 for every index
+    bands = {name: nir.astype(np.float32) / 10000
+             for name in ('red', 'nir', 'green', 'blue', 'swir1', 'swir2')}
+    names = ['ndvi', 'ndwi', 'evi', 'savi', 'ndbi', 'nbr', 'ndmi', 'ndsi']
+    for name, result in farq.calculate_indices(bands, names).items():
+        assert result.dtype == np.float32, name
+    
+    farq.set_precision("float64")
+    try:
+        assert farq.ndvi(nir, red).dtype == np.float64
+        assert farq.evi(red, nir, red, reflectance_scale=10000).dtype == np.float64
+    finally:
+        farq.set_precision("float32")
+    
+    with pytest.raises(ValueError):
+        farq.set_precision("int8")
+
+def test_tiled_kernels_match_untiled():
+    """Test tiled NumPy kernels give the same result as a single tile."""
+    rng = np.random.default_rng(1)
+    red, nir, blue = rng.random((3, 37, 23))
+    
+    tiled = np.empty_like(red)
+    whole = np.empty_like(red)
+    fn = lambda r, n, b, o: farq._kernels._evi_numpy(r, n, b, o, 2.5, 6.0, 7.5, 1.0, 1.0)
+    farq._kernels._tiled_apply(fn, red, nir, blue, out=tiled, tile=64)
+    farq._kernels._tiled_apply(fn, red, nir, blue, out=whole, tile=red.size)
+    
+    assert np.array_equal(tiled, whole)
+    assert np.allclose(tiled, farq.evi(red, nir, blue))
+
+def test_threaded_tiles_match_serial():
+    """Test tiles split between threads give the same result as one thread."""
+    rng = np.random.default_rng(4)
+    a, b = rng.integers(0, 10000, size=(2, 600, 500), dtype=np.uint16)
+    
+    fn = lambda a, b, o: farq._kernels._nd_numpy(a, b, o, True)
+    serial = farq._kernels._tiled_apply(fn, a, b, out=np.empty(a.shape, np.float32), max_workers=1)
+    threaded = farq._kernels._tiled_apply(fn, a, b, out=np.empty(a.shape, np.float32),
+                                          tile=1000, max_workers=4)
+    assert np.array_equal(serial, threaded)
+
+def test_scaled_savi_evi():
+    """Test reflectance scaling inside the SAVI/EVI kernels matches scaled bands."""
+    rng = np.random.default_rng(3)
+    red, nir, blue = rng.integers(0, 10000, size=(3, 40, 30), dtype=np.uint16)
+    r, n, b = (band / 10000.0 for band in (red, nir, blue))
+    
+    expected_savi = np.clip((n - r) / (n + r + 0.5) * 1.5, -1, 1)
+    expected_evi = np.clip(2.5 * (n - r) / (n + 6.0 * r - 7.5 * b + 1.0), -1, 1)
+    
+    result_savi = farq.savi(nir, red, reflectance_scale=10000)
+    result_evi = farq.evi(red, nir, blue, reflectance_scale=10000)
+    assert result_savi.dtype == np.float32 and result_evi.dtype == np.float32
+    assert np.allclose(result_savi, expected_savi, atol=1e-5)
+    assert np.allclose(result_evi, expected_evi, atol=1e-4)
+    
+    # The NumPy fallbacks fold the scale into L instead of scaling the bands
+    out = np.empty(red.shape, dtype=np.float32)
+    farq._kernels._savi_numpy(nir, red, out, 0.5, 10000.0)
+    assert np.allclose(out, expected_savi, atol=1e-5)
+    farq._kernels._evi_numpy(red, nir, blue, out, 2.5, 6.0, 7.5, 1.0, 10000.0)
+    assert np.allclose(out, expected_evi, atol=1e-4)
+
+def test_savi_evi_float16_input():
+    """Test half precision bands are calculated in float32, alone and fused."""
+    rng = np.random.default_rng(4)
+    red, nir = rng.random((2, 30, 20), dtype=np.float32).astype(np.float16)
+    blue = (rng.random((30, 20)) * 0.1).astype(np.float16)
+    red32, nir32, blue32 = (band.astype(np.float32) for band in (red, nir, blue))
+    
+    expected = {'savi': farq.savi(nir32, red32), 'evi': farq.evi(red32, nir32, blue32)}
+    result = {'savi': farq.savi(nir, red), 'evi': farq.evi(red, nir, blue)}
+    result_fused = farq.calculate_indices({'red': red, 'nir': nir, 'blue': blue}, ['savi', 'evi'])
+    for name in ('savi', 'evi'):
+        assert result[name].dtype == np.float32 and result_fused[name].dtype == np.float32
+        np.testing.assert_allclose(result[name], expected[name], atol=1e-6)
+        np.testing.assert_allclose(result_fused[name], expected[name], atol=1e-6)
+
+def test_precompile():
+    """Test kernel precompilation runs and leaves results unchanged."""
+    farq.precompile()
+    
+    green = np.array([[0.2, 0.4]], dtype=np.float32)
+    nir = np.array([[0.4, 0.2]], dtype=np.float32)
+    assert np.allclose(farq.ndwi(green, nir), [[1/3, -1/3]])
+
+def test_ndwi_q8():
+    """Test int8 NDWI matches the rounded float index and its sign."""
+    rng = np.random.default_rng(2)
+    green, nir = rng.integers(0, 10000, size=(2, 30, 40), dtype=np.uint16)
+    green[0, 0] = nir[0, 0] = 0
+    
+    quantized = farq.ndwi_q8(green, nir)
+    expected = farq.ndwi(green, nir)
+    
+    assert quantized.dtype == np.int8
+    assert np.abs(quantized - np.rint(expected * 127)).max() <= 1
+    assert np.array_equal(quantized > 0, expected > 0)
+    assert np.array_equal(quantized < 0, expected < 0)
+    
+    green, nir = green.astype(np.float16), nir.astype(np.float16)
+    half = farq.ndwi_q8(green, nir)
+    assert np.array_equal(half, farq.ndwi_q8(green.astype(np.float32), nir.astype(np.float32)))
+
+def test_small_inputs_limit_threads():
+    """Test small inputs run on fewer numba threads and restore the setting."""
+    numba = pytest.importorskip("numba")
+    from farq import _kernels
+    
+    n_threads = numba.get_num_threads()
+    with _kernels._threads_for(10):
+        assert numba.get_num_threads() == 1
+    with _kernels._threads_for(10 ** 9):
+        assert numba.get_num_threads() == n_threads
+    assert numba.get_num_threads() == n_threads
+
+def test_index_out_parameter(monkeypatch):
+    """Test indices write into a caller-provided buffer."""
+    nir = np.array([[1000, 0], [3000, 4000]], dtype=np.uint16)
+    red = np.array([[500, 0], [1000, 4000]], dtype=np.uint16)
+    blue = np.array([[200, 0], [300, 400]], dtype=np.uint16)
+    
+    out = np.full(nir.shape, np.nan, dtype=np.float32)
+    assert farq.ndvi(nir, red, out=out) is out
+    np.testing.assert_allclose(out, farq.ndvi(nir, red))
+    assert out[0, 1] == 0  # Zero denominator
+    
+    assert farq.savi(nir, red, reflectance_scale=10000, out=out) is out
+    np.testing.assert_allclose(out, farq.savi(nir, red, reflectance_scale=10000))
+    assert farq.evi(red, nir, blue, reflectance_scale=10000, out=out) is out
+    np.testing.assert_allclose(out, farq.evi(red, nir, blue, reflectance_scale=10000))
+    
+    # The output may be one of the bands, also in the NumPy fallback
+    for has_numba in {farq._kernels.HAS_NUMBA, False}:
+        monkeypatch.setattr(farq._kernels, 'HAS_NUMBA', has_numba)
+        red_out = red.astype(np.float32)
+        farq.ndvi(nir, red_out, out=red_out)
+        np.testing.assert_allclose(red_out, farq.ndvi(nir, red))
+        red_out = red.astype(np.float32)
+        farq.savi(nir, red_out, out=red_out)
+        np.testing.assert_allclose(red_out, farq.savi(nir, red))
+        nir_out = nir.astype(np.float32)
+        farq.evi(red, nir_out, blue, reflectance_scale=10000, out=nir_out)
+        np.testing.assert_allclose(nir_out, farq.evi(red, nir, blue, reflectance_scale=10000))
+    
+    with pytest.raises(ValueError):
+        farq.ndvi(nir, red, out=np.empty((3, 3), dtype=np.float32))
+    with pytest.raises(ValueError):
+        farq.ndvi(nir, red, out=np.empty(nir.shape, dtype=np.int32))
+
+def test_ndsi():
+    """Test NDSI = (GREEN - SWIR1) / (GREEN + SWIR1)."""
+    green = np.array([[8000, 1000], [0, 3000]], dtype=np.uint16)
+    swir1 = np.array([[1000, 3000], [0, 3000]], dtype=np.uint16)
+    
+    result = farq.ndsi(green, swir1)
+    np.testing.assert_allclose(result, [[7/9, -0.5], [0, 0]], rtol=1e-6)
+    assert np.array_equal(result, farq.calculate_normalized_difference(green, swir1))
+
+def test_dask_bands():
+    """Test indices of dask bands are lazy and match the in-memory results."""
+    da = pytest.importorskip("dask.array")
+    rng = np.random.default_rng(0)
+    green, nir, red = rng.integers(0, 10000, (3, 300, 200), dtype=np.uint16)
+    
+    lazy_green = da.from_array(green, chunks=(100, 100))
+    result = farq.ndwi(lazy_green, nir)
+    assert isinstance(result, da.Array)
+    assert result.dtype == np.float32
+    assert result.chunks == lazy_green.chunks
+    assert np.array_equal(result.compute(), farq.ndwi(green, nir))
+    
+    lazy_red = da.from_array(red, chunks=(64, 50))
+    np.testing.assert_array_equal(
+        farq.savi(nir, lazy_red, reflectance_scale=10000).compute(),
+        farq.savi(nir, red, reflectance_scale=10000))
+    np.testing.assert_array_equal(
+        farq.evi(lazy_red, nir, green, reflectance_scale=10000).compute(),
+        farq.evi(red, nir, green, reflectance_scale=10000))
+    
+    with pytest.raises(ValueError):
+        farq.ndwi(lazy_green, nir, out=np.empty(nir.shape, dtype=np.float32))
+
+def test_calculate_indices_fused_vegetation(monkeypatch):
+    """Test NDVI, SAVI and EVI requested together match the single functions."""
+    rng = np.random.default_rng(5)
+    red, nir, blue = rng.integers(0, 10000, size=(3, 60, 50), dtype=np.uint16)
+    red[0, 0] = nir[0, 0] = 0
+    bands = {'red': red, 'nir': nir, 'blue': blue, 'green': blue}
+    expected = {
+        'ndvi': farq.ndvi(nir, red),
+        'savi': farq.savi(nir, red, reflectance_scale=10000),
+        'evi': farq.evi(red, nir, blue, reflectance_scale=10000),
+        'ndwi': farq.ndwi(blue, nir),
+    }
+    # EVI is ill-conditioned where its denominator is close to zero
+    r, n, b = (band / 10000 for band in (red, nir, blue))
+    stable = np.abs(n + 6 * r - 7.5 * b + 1) > 1e-3
+    
+    for names in (['evi', 'ndvi', 'savi'], ['ndvi', 'savi'], ['savi', 'ndwi', 'evi']):
+        result = farq.calculate_indices(bands, names, reflectance_scale=10000)
+        assert list(result) == names
+        for name in names:
+            assert result[name].dtype == np.float32
+            np.testing.assert_allclose(result[name][stable], expected[name][stable], atol=1e-4)
+    
+    # The NumPy fallback computes all indices tile by tile
+    monkeypatch.setattr(farq._kernels, 'HAS_NUMBA', False)
+    result = farq.calculate_indices(bands, ['ndvi', 'savi', 'evi'], reflectance_scale=10000)
+    for name in ('ndvi', 'savi', 'evi'):
+        np.testing.assert_allclose(result[name][stable], expected[name][stable], atol=1e-4)
+    
+    # Blue is ignored unless EVI is requested
+    result = farq.calculate_indices({'red': red, 'nir': nir, 'blue': blue[:1]}, ['ndvi', 'savi'])
+    np.testing.assert_allclose(result['ndvi'], expected['ndvi'], atol=1e-4)
+    
+    with pytest.raises(ValueError):
+        farq.calculate_indices({'red': red, 'nir': nir}, ['ndvi', 'evi'])
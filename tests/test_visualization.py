@@ -4,6 +4,7 @@ Tests for visualization functions.
 import numpy as np
 import pytest
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import farq
 
 @pytest.fixture(autouse=True)
@@ -12,9 +13,14 @@ def close_figures():
     yield
     plt.close('all')
 
-def test_plot_basic():
+@pytest.fixture(scope="module")
+def shared_axes():
+    """Pair of side-by-side axes of a figure reused across tests."""
+    return Figure(figsize=(15, 6)).subplots(1, 2)
+
+def test_plot_basic(rng):
     """Test basic plot functionality."""
-    data = np.random.rand(10, 10)
+    data = rng.random((10, 10), dtype=np.float32)
     fig = farq.plot(data, title="Test Plot")
     
     # Count only non-colorbar axes
@@ -22,9 +28,9 @@ def test_plot_basic():
     assert len(plot_axes) == 1
     assert plot_axes[0].get_title() == "Test Plot"
 
-def test_plot_with_colormap():
+def test_plot_with_colormap(rng):
     """Test plot with custom colormap."""
-    data = np.random.rand(10, 10)
+    data = rng.random((10, 10), dtype=np.float32)
     fig = farq.plot(data, cmap="RdYlBu", vmin=-1, vmax=1)
     
     # Count only non-colorbar axes
@@ -32,11 +38,47 @@ def test_plot_with_colormap():
     assert len(plot_axes) == 1
     assert plot_axes[0].images[0].get_cmap().name == "RdYlBu"
 
-def test_compare_plots():
+def test_fast_plotter_reuses_figure(rng):
+    """Test FastPlotter updates one figure instead of creating new ones."""
+    plotter = farq.FastPlotter(cmap="RdYlBu")
+    fig1 = plotter.plot(np.zeros((10, 10)), title="First", vmin=-1, vmax=1)
+    data = rng.random((12, 8), dtype=np.float32)
+    fig2 = plotter.plot(data, title="Second")
+    
+    assert fig1 is fig2
+    assert len(fig2.axes[0].images) == 1
+    assert plotter.ax.get_title() == "Second"
+    assert np.array_equal(plotter.im.get_array(), data)
+    assert plotter.im.get_clim() == (data.min(), data.max())
+    
+    plt.close('all')
+    assert plotter.plot(data) is not fig2
+
+def test_plot_reuses_axes(rng):
+    """Test plotting into given axes updates the existing images."""
+    fig, ax = plt.subplots()
+    farq.plot(np.zeros((10, 10)), ax=ax, vmin=-1, vmax=1)
+    data = rng.random((12, 8), dtype=np.float32)
+    assert farq.plot(data, ax=ax, title="Second") is fig
+    
+    assert len(ax.images) == 1
+    assert len(fig.axes) == 2  # Plot and a single colorbar
+    assert np.array_equal(ax.images[0].get_array(), data)
+    assert ax.images[0].get_clim() == (data.min(), data.max())
+    
+    fig, axes = plt.subplots(1, 2)
+    for _ in range(2):
+        assert farq.compare(data, data, axes=axes) is fig
+    assert [len(a.images) for a in axes] == [1, 1]
+    
+    assert farq.changes(data - 0.5, ax=axes[0]) is fig
+    assert farq.hist(data, ax=axes[1]) is fig
+
+def test_compare_plots(rng, shared_axes):
     """Test comparison plot functionality."""
-    data1 = np.random.rand(10, 10)
-    data2 = np.random.rand(10, 10)
-    fig = farq.compare(data1, data2, title1="Plot 1", title2="Plot 2")
+    data1 = rng.random((10, 10), dtype=np.float32)
+    data2 = rng.random((10, 10), dtype=np.float32)
+    fig = farq.compare(data1, data2, title1="Plot 1", title2="Plot 2", axes=shared_axes)
     
     # Count only non-colorbar axes
     plot_axes = [ax for ax in fig.axes if 'colorbar' not in ax.get_label()]
@@ -53,27 +95,27 @@ def test_plot_invalid_data():
     with pytest.raises(ValueError):
         farq.plot(np.array([1, 2, 3]))  # 1D array
 
-def test_compare_invalid_shapes():
+def test_compare_invalid_shapes(rng):
     """Test comparison with invalid shapes."""
-    data1 = np.random.rand(10, 10)
-    data2 = np.random.rand(10, 11)
+    data1 = rng.random((10, 10), dtype=np.float32)
+    data2 = rng.random((10, 11), dtype=np.float32)
     with pytest.raises(ValueError):
         farq.compare(data1, data2)
 
-def test_plot_with_title():
+def test_plot_with_title(rng):
     """Test plot with title."""
-    data = np.random.rand(10, 10)
+    data = rng.random((10, 10), dtype=np.float32)
     fig = farq.plot(data, title="Test Title")
     
     # Get main plot axis (not colorbar)
     plot_ax = [ax for ax in fig.axes if 'colorbar' not in ax.get_label()][0]
     assert plot_ax.get_title() == "Test Title"
 
-def test_compare_with_titles():
+def test_compare_with_titles(rng, shared_axes):
     """Test comparison with titles."""
-    data1 = np.random.rand(10, 10)
-    data2 = np.random.rand(10, 10)
-    fig = farq.compare(data1, data2, title1="First", title2="Second")
+    data1 = rng.random((10, 10), dtype=np.float32)
+    data2 = rng.random((10, 10), dtype=np.float32)
+    fig = farq.compare(data1, data2, title1="First", title2="Second", axes=shared_axes)
     
     # Get main plot axes (not colorbars)
     plot_axes = [ax for ax in fig.axes if 'colorbar' not in ax.get_label()]
@@ -90,26 +132,36 @@ def test_plot_value_range():
     assert plot_ax.images[0].norm.vmin == 0
     assert plot_ax.images[0].norm.vmax == 3
 
-def test_plot_colorbar():
+def test_plot_colorbar(rng):
     """Test plot colorbar."""
-    data = np.random.rand(10, 10)
+    data = rng.random((10, 10), dtype=np.float32)
     fig = farq.plot(data, colorbar_label="Values")
     
     # Get colorbar axis
     cbar_ax = [ax for ax in fig.axes if 'colorbar' in ax.get_label()][0]
     assert cbar_ax.get_ylabel() == "Values"
 
-def test_compare_colorbars():
+def test_compare_colorbars(rng, shared_axes):
     """Test comparison colorbars."""
-    data1 = np.random.rand(10, 10)
-    data2 = np.random.rand(10, 10)
-    fig = farq.compare(data1, data2, colorbar_label="Values")
+    data1 = rng.random((10, 10), dtype=np.float32)
+    data2 = rng.random((10, 10), dtype=np.float32)
+    fig = farq.compare(data1, data2, colorbar_label="Values", axes=shared_axes)
     
     # Get colorbar axes
     cbar_axes = [ax for ax in fig.axes if 'colorbar' in ax.get_label()]
     assert len(cbar_axes) == 2
     assert all(ax.get_ylabel() == "Values" for ax in cbar_axes)
 
+def test_compare_shared_limits():
+    """Test compare scales both images to the range of both arrays."""
+    data1 = np.array([[0.0, np.nan], [0.5, 0.2]])
+    data2 = np.array([[-1.0, 0.1], [2.0, np.nan]])
+    fig = farq.compare(data1, data2)
+    
+    plot_axes = [ax for ax in fig.axes if 'colorbar' not in ax.get_label()]
+    assert all(ax.images[0].get_clim() == (-1.0, 2.0) for ax in plot_axes)
+    assert farq._kernels.minmax(np.full(3, np.nan)) == pytest.approx((np.nan, np.nan), nan_ok=True)
+
 def test_plot_nan_values():
     """Test plot with NaN values."""
     data = np.array([[1, np.nan], [3, 4]])
@@ -119,23 +171,69 @@ def test_plot_nan_values():
     plot_ax = [ax for ax in fig.axes if 'colorbar' not in ax.get_label()][0]
     assert plot_ax is not None
 
-def test_plot_large_array():
-    """Test plot with large array."""
-    data = np.random.rand(1000, 1000)
-    fig = farq.plot(data)
+def test_plot_downsamples_large_array(rng):
+    """Test large arrays are area-averaged to the display size."""
+    data = rng.random((2000, 3000), dtype=np.float32)
+    data[0, 0] = np.nan
+    fig = farq.plot(data, figsize=(2, 2))
     
-    # Get main plot axis (not colorbar)
-    plot_ax = [ax for ax in fig.axes if 'colorbar' not in ax.get_label()][0]
-    assert plot_ax is not None
+    image = fig.axes[0].images[0]
+    assert image.get_array().shape == (250, 375)
+    assert image.get_extent() == [-0.5, 2999.5, 1999.5, -0.5]
+    assert image.get_clim() == (np.nanmin(data), np.nanmax(data))
+    assert np.isclose(image.get_array()[1, 1], data[8:16, 8:16].mean())
+
+def test_compare_and_changes_downsample_large_arrays(rng):
+    """Test compare and changes downsample to the size of their panels."""
+    data = rng.random((1200, 1200), dtype=np.float32) - 0.5
+    abs_max = np.abs(data).max()
+    
+    fig = farq.compare(data, data * 2, figsize=(4, 2))
+    for ax in [ax for ax in fig.axes if 'colorbar' not in ax.get_label()]:
+        image = ax.images[0]
+        assert image.get_array().shape == (400, 400)
+        assert image.get_extent() == [-0.5, 1199.5, 1199.5, -0.5]
+        assert image.get_clim() == (data.min() * 2, data.max() * 2)
+    
+    fig = farq.changes(data, figsize=(2, 2))
+    assert fig.axes[0].images[0].get_array().shape == (400, 400)
+    assert fig.axes[0].images[0].get_clim() == (-abs_max, abs_max)
 
-def test_compare_different_colormaps():
+def test_compare_different_colormaps(rng, shared_axes):
     """Test comparison with different colormaps."""
-    data1 = np.random.rand(10, 10)
-    data2 = np.random.rand(10, 10)
-    fig = farq.compare(data1, data2, cmap="viridis")
+    data1 = rng.random((10, 10), dtype=np.float32)
+    data2 = rng.random((10, 10), dtype=np.float32)
+    for cmap in ("viridis", "magma"):
+        fig = farq.compare(data1, data2, cmap=cmap, axes=shared_axes)
+        
+        # Get main plot axes (not colorbars)
+        plot_axes = [ax for ax in fig.axes if 'colorbar' not in ax.get_label()]
+        assert len(plot_axes) == 2
+        assert all(ax.images[0].get_cmap().name == cmap for ax in plot_axes)
+  
+def test_hist_matches_numpy_histogram():
+    """Test hist bars match np.histogram of the finite, scaled values."""
+    data = np.random.default_rng(0).integers(0, 10000, size=(50, 40)).astype(np.float32)
+    data[0, :3] = np.nan
     
-    # Get main plot axes (not colorbars)
-    plot_axes = [ax for ax in fig.axes if 'colorbar' not in ax.get_label()]
-    assert len(plot_axes) == 2
-    assert all(ax.images[0].get_cmap().name == "viridis" for ax in plot_axes)
-  
\ No newline at end of file
+    for density in (True, False):
+        fig = farq.hist(data, bins=20, density=density, reflectance_scale=10000)
+        counts, edges = np.histogram(data[~np.isnan(data)] / 10000, bins=20, density=density)
+        bars = fig.axes[0].patches
+        assert len(bars) == 20
+        assert np.allclose([bar.get_height() for bar in bars], counts)
+        assert np.allclose([bar.get_x() for bar in bars], edges[:-1])
+        plt.close(fig)
+    
+    # Explicit edges are in reflectance units, like the plotted values
+    edges = np.linspace(0, 1, 11)
+    fig = farq.hist(data, bins=edges, density=False, reflectance_scale=10000)
+    counts, _ = np.histogram(data[~np.isnan(data)] / 10000, bins=edges)
+    assert np.array_equal([bar.get_height() for bar in fig.axes[0].patches], counts)
+    assert np.allclose([bar.get_x() for bar in fig.axes[0].patches], edges[:-1])
+    plt.close(fig)
+    
+    half = np.random.default_rng(1).random((50, 40)).astype(np.float16)
+    fig = farq.hist(half, bins=20, density=False)
+    heights = [bar.get_height() for bar in fig.axes[0].patches]
+    assert len(heights) == 20 and sum(heights) == half.size